@@ -0,0 +1,182 @@
+'''
+Visibility- and power-aware animation scheduler.
+
+Decides how fast the pet's FramePlayer may run:
+
+Window hidden, minimised, not exposed (covered, locked screen) → paused
+User idle for idle_timeout seconds → idle_fps
+State with a low frame rate (e.g. sleep) → the state's cap
+Otherwise → full speed
+
+Playback resumes immediately when the window is exposed again.
+The player keeps the frames rendered / frames skipped counters.
+
+Idle users are detected by sampling the cursor position. While the user is
+idle, the cursor is sampled no more often than the pet shows frames, so the
+poll does not add wakeups of its own. Pets sharing a CursorMonitor (see
+pet_manager.py) share one poll.
+'''
+
+import time                                     # Import time module for the time between two polls
+from PyQt5 import sip                           # Skip the schedulers of deleted pets
+from PyQt5.QtCore import Qt, QObject, QEvent, QTimer, QPoint  # Import core modules (events, timer)
+from PyQt5.QtGui import QCursor, QGuiApplication  # Import cursor and application state access
+
+
+# Frame-rate caps per pet state (frames per second); states not listed run at full speed
+DEFAULT_STATE_FPS = {"sleep": 0.25}
+
+# Frame-rate cap while the user is idle
+DEFAULT_IDLE_FPS = 0.5
+
+# Events the scheduler reacts to; the filter sees every event of the window, and returns early for the others
+WATCHED_EVENTS = frozenset((QEvent.Expose, QEvent.Show, QEvent.Hide, QEvent.WindowStateChange,
+                            QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.MouseButtonDblClick))
+
+# How often the cursor position is sampled to detect an idle user (ms): while active, and at least this long
+# apart while idle (where the interval between two shown frames is used if it is longer)
+ACTIVE_CHECK_INTERVAL = 5000
+IDLE_CHECK_INTERVAL = 1000
+
+
+# Samples the cursor position for the idle detection of one or more schedulers, with a single timer
+class CursorMonitor(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.schedulers = []
+        self.last_pos = QPoint(QCursor.pos())
+        self.last_poll = time.monotonic()
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)
+        self.timer.timeout.connect(self.poll)
+        self.polls = 0
+
+    def add(self, scheduler):
+        self.schedulers.append(scheduler)
+        self.rearm()
+
+    # Poll as often as the most demanding scheduler asks; the timer is only restarted when that interval changes
+    def rearm(self):
+        self.schedulers = [scheduler for scheduler in self.schedulers if not sip.isdeleted(scheduler)]
+        intervals = [scheduler.check_interval() for scheduler in self.schedulers if scheduler.idle_timeout]
+        if not intervals:
+            self.timer.stop()
+            return
+        interval = min(intervals)
+        if not self.timer.isActive():
+            self.last_poll = time.monotonic()
+            self.timer.start(interval)
+        elif interval != self.timer.interval():
+            self.timer.start(interval)
+
+    def poll(self):
+        self.polls += 1
+        now = time.monotonic()
+        elapsed = (now - self.last_poll) * 1000
+        self.last_poll = now
+        pos = QCursor.pos()
+        moved = pos != self.last_pos
+        self.last_pos = QPoint(pos)
+        for scheduler in list(self.schedulers):
+            if not sip.isdeleted(scheduler):
+                scheduler.check_idle(moved, elapsed)
+        self.rearm()  # Drops the schedulers of deleted pets
+
+
+class AnimationScheduler(QObject):
+    # monitor: a CursorMonitor shared with other pets (default: one of its own)
+    def __init__(self, window, player, idle_timeout=300, idle_fps=DEFAULT_IDLE_FPS, state_fps=None, monitor=None):
+        super().__init__(window)
+        self.window = window
+        self.player = player
+        self.idle_timeout = idle_timeout          # Seconds without input before the user counts as idle (0 disables)
+        self.idle_fps = idle_fps
+        self.state_fps = dict(DEFAULT_STATE_FPS if state_fps is None else state_fps)
+        self.status = None
+        self.exposed = True
+        self.user_idle = False
+        self.idle_ms = 0                          # Time since the cursor was last seen moving
+        self.monitor = monitor if monitor is not None else CursorMonitor(self)
+        self.monitor.add(self)
+
+        window.installEventFilter(self)
+        self.watched_handle = None
+        self.watch_window_handle()
+        QGuiApplication.instance().applicationStateChanged.connect(self.update_policy)
+
+    # Expose events are delivered to the QWindow, not to the widget, so watch the native window as well
+    def watch_window_handle(self):
+        handle = self.window.windowHandle()
+        if handle is not None and handle is not self.watched_handle:
+            handle.installEventFilter(self)
+            self.watched_handle = handle
+
+    # Other events (e.g. the ChildRemoved events of a window being torn down) return before any attribute is touched,
+    # as the garbage collector may already have cleared this object while the window deletes its children
+    def eventFilter(self, obj, event):
+        kind = event.type()
+        if kind not in WATCHED_EVENTS:
+            return False
+        if obj is self.watched_handle and kind == QEvent.Expose:
+            self.exposed = self.watched_handle.isExposed()
+            self.update_policy()
+        elif obj is self.window:
+            if kind in (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange):
+                self.watch_window_handle()
+                self.update_policy()
+            elif kind in (QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.MouseButtonDblClick):
+                self.user_active()
+        return False
+
+    # Called whenever the pet switches to a new state or animation
+    def set_status(self, status):
+        self.status = status
+        self.update_policy()
+
+    def is_hidden(self):
+        app_state = QGuiApplication.applicationState()
+        return (not self.window.isVisible() or self.window.isMinimized() or not self.exposed
+                or app_state in (Qt.ApplicationHidden, Qt.ApplicationSuspended))
+
+    # Apply the current policy to the player
+    def update_policy(self, *args):
+        if self.is_hidden():
+            self.player.pause()
+        else:
+            caps = [fps for fps in (self.state_fps.get(self.status), self.idle_fps if self.user_idle else None) if fps]
+            self.player.set_max_fps(min(caps) if caps else None)
+            self.player.resume()
+        self.monitor.rearm()
+
+    # Cursor sampling interval this pet needs (ms): noticing the user come back faster than a frame is shown gains nothing
+    def check_interval(self):
+        if not self.user_idle or self.player.paused:
+            return ACTIVE_CHECK_INTERVAL
+        return max(IDLE_CHECK_INTERVAL, self.player.min_interval)
+
+    # Called by the monitor after each cursor sample; elapsed: ms since the previous sample
+    def check_idle(self, moved, elapsed):
+        if moved:
+            self.user_active()
+            return
+        self.idle_ms += elapsed
+        if not self.user_idle and self.idle_ms >= self.idle_timeout * 1000:
+            self.user_idle = True
+            self.update_policy()
+
+    def user_active(self):
+        self.idle_ms = 0
+        if self.user_idle:
+            self.user_idle = False
+            self.update_policy()
+
+    # Frames rendered and skipped so far
+    def stats(self):
+        return {
+            "frames_rendered": self.player.frames_rendered,
+            "frames_skipped": self.player.frames_skipped,
+            "paused": self.player.paused,
+            "user_idle": self.user_idle,
+            "cursor_polls": self.monitor.polls,
+            "max_fps": 1000 / self.player.min_interval if self.player.min_interval else None,
+        }
@@ -0,0 +1,302 @@
+'''
+Benchmarks of the animation and interaction hot paths, with a baseline comparison.
+
+Every group runs in a fresh process under Qt's offscreen platform, so it works
+on a headless box and the groups do not share caches:
+
+switch    update_gif latency per asset, cold (decoded from disk) and warm (cached), and set_status end to end
+paint     paint time per frame at several window sizes
+heart     cost of show_heart and of painting with a fading heart on top of the frame
+drag      cost of one mouse-move event while dragging, and of the release
+rss       resident memory after each asset has been loaded, and the size of its decoded frames
+startup   time of the imports (Qt included), of creating the QApplication, to the first frame and to a
+          finished startup, in a new process
+
+All values are "lower is better" (milliseconds or MiB). The results can be
+saved as JSON, and compared with a stored baseline: a metric regresses when it
+is more than --threshold (relative) and more than --noise (absolute) above the
+baseline, and the exit status is then 1.
+
+python benchmarks/hot_paths.py
+python benchmarks/hot_paths.py --update-baseline            # store the results as benchmarks/baseline.json
+python benchmarks/hot_paths.py --threshold 0.1 --json now.json
+python benchmarks/hot_paths.py --only switch paint --sizes 150 300 --repeat 20
+'''
+
+import argparse                                 # Import the command line argument parser
+import json                                     # Import json for the child results and the result files
+import os                                       # Import the operating system module and process the file path
+import statistics                               # Medians of the repeated measurements
+import subprocess                               # Run each group in its own process
+import sys                                      # Import system modules
+import time                                     # Import time module for the measurements
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from multi_pet import rss_kib                    # Resident set size of the current process
+from event_log import EVENT_LOG                  # Silence the pet's terminal output while measuring
+
+GROUPS = ["switch", "paint", "heart", "drag", "rss", "startup"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Every asset as the (status, mood) that shows it
+ASSETS = [("study", 1), ("study", 3), ("study", 5), ("game", 1), ("game", 3), ("game", 5),
+          ("guitar", 5), ("sleep", 5), ("idle", 5)]
+
+
+# Milliseconds taken by one call
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return (time.perf_counter() - started) * 1000
+
+
+def median(values):
+    return statistics.median(values) if values else 0.0
+
+
+# A started, exposed pet without background prefetching, so every measurement covers the work itself
+def make_pet(window_size=150):
+    import desktop_puppy
+    from PyQt5.QtWidgets import QApplication
+    pet = desktop_puppy.DesktopPet(window_size=window_size, idle_timeout=0, status="idle")
+    pet.prefetcher.limit = 0
+    deadline = time.perf_counter() + 2
+    while not pet.windowHandle().isExposed() and time.perf_counter() < deadline:
+        QApplication.processEvents()  # Until exposed, repaint() does not paint
+    pet.finish_startup()
+    return pet
+
+
+def show_asset(pet, status, mood):
+    pet.engine.status = status
+    pet.engine.mood = mood
+    pet.update_gif()
+
+
+# Name of the asset a pet shows, without directory, extension or sprite-sheet size
+def asset_name(pet):
+    return os.path.splitext(os.path.basename(pet.get_gif_path()))[0].split("@")[0]
+
+
+def bench_switch(args):
+    pet = make_pet()
+    results = {}
+    for status, mood in ASSETS:
+        cold, warm = [], []
+        for _ in range(args.repeat):
+            pet.frame_cache.clear()
+            cold.append(timed(show_asset, pet, status, mood))
+            warm.append(timed(show_asset, pet, status, mood))
+        name = asset_name(pet)
+        results[f"switch.cold.{name}_ms"] = median(cold)
+        results[f"switch.warm.{name}_ms"] = median(warm)
+    # set_status with every rule applied, on cached frames
+    times = []
+    for _ in range(args.repeat):
+        for status in ["study", "guitar", "game", "sleep", "idle"]:
+            pet.engine.mood = pet.engine.energy = 5
+            times.append(timed(pet.set_status, status))
+    results["switch.set_status_ms"] = median(times)
+    return results
+
+
+# Paint the canvas synchronously once per frame of the current animation, `rounds` times over
+def paint_times(pet, rounds):
+    times = []
+    frames = pet.player.animation.frames
+    for _ in range(rounds):
+        for frame in frames:
+            pet.canvas.set_frame(frame)
+            times.append(timed(pet.canvas.repaint))
+    return times
+
+
+def bench_paint(args):
+    results = {}
+    for size in args.sizes:
+        pet = make_pet(size)
+        paint_times(pet, 1)  # Warm-up
+        results[f"paint.{size}px_ms"] = median(paint_times(pet, args.repeat))
+        pet.close()
+    return results
+
+
+def bench_heart(args):
+    pet = make_pet()
+    paint_times(pet, 1)
+    plain = median(paint_times(pet, args.repeat))
+    first = timed(pet.show_heart)   # Loads and scales the heart picture
+    again = [timed(pet.show_heart) for _ in range(args.repeat)]
+    with_heart = median(paint_times(pet, args.repeat))
+    return {"heart.first_show_ms": first, "heart.show_ms": median(again),
+            "heart.paint_ms": with_heart, "heart.paint_overhead_ms": max(0.0, with_heart - plain)}
+
+
+def bench_drag(args):
+    from PyQt5.QtCore import Qt, QPoint, QEvent
+    from PyQt5.QtGui import QMouseEvent
+    pet = make_pet()
+
+    def event(kind, pos, buttons):
+        return QMouseEvent(kind, QPoint(10, 10), pos, Qt.LeftButton, buttons, Qt.NoModifier)
+
+    moves, releases = [], []
+    for _ in range(args.repeat):
+        start = pet.pos() + QPoint(10, 10)
+        pet.mousePressEvent(event(QEvent.MouseButtonPress, start, Qt.LeftButton))
+        for step in range(100):
+            moves.append(timed(pet.mouseMoveEvent, event(QEvent.MouseMove, start + QPoint(step, step), Qt.LeftButton)))
+        releases.append(timed(pet.mouseReleaseEvent, event(QEvent.MouseButtonRelease, start, Qt.NoButton)))
+    return {"drag.move_event_ms": median(moves), "drag.release_ms": median(releases)}
+
+
+# Resident set size after returning freed heap memory to the system (decoding leaves large temporary buffers behind)
+def settled_rss_kib():
+    import ctypes
+    import gc
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass  # Not glibc
+    return rss_kib()
+
+
+# RSS growth when each asset is loaded (kept in the frame cache), and the exact size of its frames
+def bench_rss(args):
+    pet = make_pet()
+    pet.frame_cache.clear()
+    base = settled_rss_kib()
+    results = {"rss.base_mib": base / 1024}
+    previous = base
+    for status, mood in ASSETS:
+        show_asset(pet, status, mood)
+        current = settled_rss_kib()
+        name = asset_name(pet)
+        results[f"rss.{name}_mib"] = max(0, current - previous) / 1024
+        results[f"frames.{name}_mib"] = pet.player.animation.nbytes / 1024 / 1024
+        previous = current
+    results["rss.all_assets_mib"] = max(0, previous - base) / 1024
+    return results
+
+
+# Startup in this (fresh) process: import, QApplication, window, first frame, finished startup
+# run_child imports desktop_puppy (and with it Qt) before it creates the QApplication, as desktop_puppy.py does
+def bench_startup(args):
+    import desktop_puppy
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance()
+    pet = desktop_puppy.DesktopPet(idle_timeout=0)
+    desktop_puppy.mark_startup("window")
+
+    def wait():
+        if pet.startup_finished:
+            app.quit()
+        else:
+            QTimer.singleShot(1, wait)
+
+    wait()
+    app.exec_()
+    finished = time.perf_counter()
+    marks = dict(desktop_puppy.startup_marks)
+    begin = desktop_puppy.STARTUP_BEGIN
+    return {"startup.imports_ms": (marks["imports"] - begin) * 1000,
+            "startup.qapplication_ms": (marks["QApplication"] - marks["imports"]) * 1000,
+            "startup.first_frame_ms": (marks.get("first frame", finished) - begin) * 1000,
+            "startup.ready_ms": (finished - begin) * 1000}
+
+
+def run_child(group, args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    if group == "startup":
+        import desktop_puppy  # The startup timing begins with this import, so Qt has not been imported yet
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])  # Referenced until the benchmark has run
+    app.setQuitOnLastWindowClosed(False)  # Closing a measured pet must not end a later measurement's event loop
+    if group == "startup":
+        desktop_puppy.mark_startup("QApplication")
+    EVENT_LOG.configure(console=False)
+    results = globals()["bench_" + group](args)
+    print(json.dumps(results))
+
+
+# Run one group in a fresh process and return its metrics
+def run_group(group, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", group, "--repeat", str(args.repeat),
+               "--sizes", *map(str, args.sizes)]
+    runs = args.startup_runs if group == "startup" else 1
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if group == "startup":
+            result["startup.process_ms"] = (time.perf_counter() - started) * 1000  # Including the interpreter
+        samples.append(result)
+    return {name: median([sample[name] for sample in samples]) for name in samples[0]}
+
+
+# Metrics that are more than threshold (relative) and noise (absolute) above the baseline
+def compare(results, baseline, threshold, noise):
+    regressions = []
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is not None and value > old * (1 + threshold) and value - old > noise:
+            regressions.append((name, old, value))
+    return regressions
+
+
+def run_parent(args):
+    results = {}
+    for group in args.only or GROUPS:
+        results.update(run_group(group, args))
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("metrics", {})
+    print(f"{'metric':<36} {'value':>10} {'baseline':>10} {'change':>8}")
+    for name, value in results.items():
+        old = baseline.get(name)
+        old_text = f"{old:>10.3f}" if old is not None else " " * 10
+        change = f"{(value / old - 1) * 100:+7.1f}%" if old else ""
+        print(f"{name:<36} {value:>10.3f} {old_text} {change:>8}")
+    document = {"metrics": results, "platform": sys.platform, "python": sys.version.split()[0],
+                "sprite_sheets": os.path.isdir(os.path.join(ROOT, "assets", "sprites")),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(document, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(document, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.noise)
+    for name, old, value in regressions:
+        print(f"REGRESSION {name}: {old:.3f} -> {value:.3f}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the animation and interaction hot paths")
+    parser.add_argument("--only", nargs="+", choices=GROUPS, help="groups to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="repetitions per measurement (default: 10)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 150, 300],
+                        help="window sizes for the paint benchmark (default: 100 150 300)")
+    parser.add_argument("--startup-runs", type=int, default=5, help="processes started for the startup time (default: 5)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative increase over the baseline counted as a regression (default: 0.2)")
+    parser.add_argument("--noise", type=float, default=0.05,
+                        help="smaller absolute increases are ignored, in ms or MiB (default: 0.05)")
+    parser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    parser.add_argument("--child", choices=GROUPS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        run_child(args.child, args)
+    else:
+        sys.exit(run_parent(args))
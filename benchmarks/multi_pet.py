@@ -0,0 +1,117 @@
+'''
+Multi-pet scaling benchmark: CPU and RSS from 1 to 50 pets in one process.
+
+Every pet count runs in a fresh process under Qt's offscreen platform. After a
+warm-up, the process CPU time is measured over a fixed window and the resident
+set size is read at the end. The same counts can be run without the shared
+frame clock and without shared frames to see what sharing saves.
+
+python benchmarks/multi_pet.py
+python benchmarks/multi_pet.py --counts 1 10 50 --seconds 10 --no-shared-clock --no-shared-frames --json result.json
+'''
+
+import argparse                                 # Import the command line argument parser
+import json                                     # Import json for the child results and the output file
+import os                                       # Import the operating system module and process the file path
+import subprocess                               # Run each configuration in its own process
+import sys                                      # Import system modules
+import time                                     # Import time module for CPU and wall-clock time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STATUSES = ["study", "guitar", "game", "sleep", "idle"]
+
+
+# Resident set size of this process in KiB
+def rss_kib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Peak instead of current outside Linux
+
+
+# Child process: run `count` pets and report CPU and RSS as one JSON line
+def run_child(count, seconds, warmup, shared_clock, shared_frames):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    import desktop_puppy
+    import frame_cache
+    from pet_manager import PetManager
+    if not shared_frames:
+        desktop_puppy.shared_frame_cache = frame_cache.FrameCache  # Every pet decodes into a cache of its own
+    started = time.perf_counter()
+    manager = PetManager(desktop_puppy.DesktopPet, count, idle_timeout=0, statuses=STATUSES, shared_clock=shared_clock)
+    result = {"pets": count, "shared_clock": shared_clock, "shared_frames": shared_frames,
+              "startup_seconds": time.perf_counter() - started}
+
+    def begin():
+        result["cpu_start"] = time.process_time()
+        result["wall_start"] = time.perf_counter()
+        result["frames_start"] = sum(pet.player.frames_rendered for pet in manager.pets)
+        QTimer.singleShot(int(seconds * 1000), finish)
+
+    def finish():
+        cpu = time.process_time() - result.pop("cpu_start")
+        wall = time.perf_counter() - result.pop("wall_start")
+        frames = sum(pet.player.frames_rendered for pet in manager.pets) - result.pop("frames_start")
+        result["cpu_percent"] = 100 * cpu / wall
+        result["frames_per_second"] = frames / wall
+        result["rss_mib"] = rss_kib() / 1024
+        if manager.clock is not None:
+            result["clock_wakeups_per_second"] = manager.clock.wakeups / (time.perf_counter() - started)
+        print(json.dumps(result))
+        app.quit()
+
+    QTimer.singleShot(int(warmup * 1000), begin)
+    app.exec_()
+
+
+def run_parent(args):
+    configurations = [(True, True)]
+    if args.no_shared_clock:
+        configurations.append((False, True))
+    if args.no_shared_frames:
+        configurations.append((True, False))
+    results = []
+    print(f"{'pets':>5} {'clock':>7} {'frames':>7} {'CPU %':>7} {'RSS MiB':>8} {'fps':>7} {'startup s':>9}")
+    for shared_clock, shared_frames in configurations:
+        for count in args.counts:
+            command = [sys.executable, os.path.abspath(__file__), "--child", str(count),
+                       "--seconds", str(args.seconds), "--warmup", str(args.warmup)]
+            if not shared_clock:
+                command.append("--no-shared-clock")
+            if not shared_frames:
+                command.append("--no-shared-frames")
+            output = subprocess.run(command, capture_output=True, text=True, cwd=ROOT, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"{count:>5} {'shared' if shared_clock else 'per-pet':>7} {'shared' if shared_frames else 'per-pet':>7} "
+                  f"{result['cpu_percent']:>7.2f} {result['rss_mib']:>8.1f} {result['frames_per_second']:>7.1f} "
+                  f"{result['startup_seconds']:>9.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU and RSS of 1 to N pets in one process")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 5, 10, 25, 50], help="pet counts to measure")
+    parser.add_argument("--seconds", type=float, default=5, help="measurement window per count (default: 5)")
+    parser.add_argument("--warmup", type=float, default=2, help="seconds before measuring (default: 2)")
+    parser.add_argument("--no-shared-clock", action="store_true", help="also measure with a timer per pet")
+    parser.add_argument("--no-shared-frames", action="store_true", help="also measure with a frame cache per pet")
+    parser.add_argument("--json", metavar="PATH", help="write the results to a JSON file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child is not None:
+        run_child(args.child, args.seconds, args.warmup, not args.no_shared_clock, not args.no_shared_frames)
+    else:
+        run_parent(args)
@@ -0,0 +1,225 @@
+'''
+Single-pass compositor for the pet window.
+
+PetCanvas draws the current animation frame and every active overlay (heart,
+tips, warnings, speech bubble) in one paintEvent, using QPainter opacity for
+fades instead of child widgets with QGraphicsOpacityEffect. Only the rectangles
+that changed are marked dirty, so a fading heart repaints the heart's rectangle
+and a new frame repaints the frame's rectangle, merged into one paint per
+event-loop pass. One timer drives all fades and expiries, and only runs while
+something is fading or waiting to expire.
+
+The window is shaped to what is drawn: the visible pixels of the frame, taken
+from its alpha channel, plus the overlays. Clicks on transparent parts go to
+the windows behind, and the window system composites only the shaped area.
+The shape of each frame is built once and cached.
+'''
+
+import time                                     # Import time module for fade and expiry times
+from collections import OrderedDict             # Ordered dictionary used as the LRU list of frame shapes
+from PyQt5.QtCore import Qt, QRect, QTimer       # Import core modules (geometry, timer)
+from PyQt5.QtGui import QPainter, QImage, QBitmap, QRegion  # Import the painter and the mask classes
+from PyQt5.QtWidgets import QWidget              # Import the base widget class
+from diagnostics import DIAGNOSTICS              # Paint-time and overlay histograms (when enabled)
+
+
+# Fade animations are updated at most this often (ms)
+FADE_INTERVAL = 33
+
+# Pixels with at least this alpha (0-255) belong to the window shape; lower ones are practically invisible
+SHAPE_ALPHA_THRESHOLD = 8
+
+# Frame shapes kept for reuse (a few animations' worth of frames)
+SHAPE_CACHE_SIZE = 512
+
+# Byte table mapping alpha values to 0 (outside the shape) or 255 (inside)
+_ALPHA_TABLE = bytes(0 if alpha < SHAPE_ALPHA_THRESHOLD else 255 for alpha in range(256))
+
+# (image cache key, width, height) -> QRegion of the image's visible pixels
+_shapes = OrderedDict()
+shape_builds = 0
+shape_hits = 0
+
+
+# The region of an image's visible pixels at a logical width×height (frames are stored at device-pixel size)
+def alpha_region(image, width, height):
+    global shape_builds, shape_hits
+    key = (image.cacheKey(), width, height)
+    region = _shapes.get(key)
+    if region is not None:
+        _shapes.move_to_end(key)
+        shape_hits += 1
+        return region
+    alpha = image.convertToFormat(QImage.Format_Alpha8)
+    if alpha.width() != width or alpha.height() != height:
+        alpha = alpha.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    ptr = alpha.constBits()
+    ptr.setsize(alpha.sizeInBytes())
+    data = bytes(ptr).translate(_ALPHA_TABLE)  # Threshold in one pass over the bytes
+    thresholded = QImage(data, width, height, alpha.bytesPerLine(), QImage.Format_Alpha8)
+    mask = thresholded.convertToFormat(QImage.Format_ARGB32).createAlphaMask()  # (Alpha8 masks come out wrong)
+    region = QRegion(QBitmap.fromImage(mask))
+    shape_builds += 1
+    _shapes[key] = region
+    if len(_shapes) > SHAPE_CACHE_SIZE:
+        _shapes.popitem(last=False)
+    return region
+
+
+# One image drawn on top of the frame, optionally fading out or disappearing at a given time
+class OverlayItem:
+    def __init__(self, image, rect, duration=None, fade=False):
+        self.image = image            # QImage or QPixmap (with its device pixel ratio set)
+        self.rect = QRect(rect)       # Logical position and size inside the canvas
+        self.opacity = 1.0
+        self.fade = fade              # Fade from 1 to 0 over the whole duration
+        self.started = time.monotonic()
+        self.duration = duration      # Seconds until the item is removed (None = until removed by hand)
+
+    def restart(self, duration=None):
+        self.started = time.monotonic()
+        if duration is not None:
+            self.duration = duration
+
+    def expires_at(self):
+        return None if self.duration is None else self.started + self.duration
+
+    # Update the opacity for the time `now`; return False once the item has expired
+    def advance(self, now):
+        if self.duration is None:
+            return True
+        elapsed = now - self.started
+        if elapsed >= self.duration:
+            return False
+        if self.fade:
+            self.opacity = 1.0 - elapsed / self.duration
+        return True
+
+
+class PetCanvas(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_OpaquePaintEvent, False)
+        self.frame = None             # Current animation frame (QImage)
+        self.frame_rect = QRect()     # Where the frame is drawn (logical pixels)
+        self.items = []               # Active OverlayItems, drawn in order on top of the frame
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.tick)
+        self.shape = None             # Region the window is currently shaped to
+        # Counters for checking the compositing cost
+        self.paint_count = 0
+        self.painted_pixels = 0
+        self.dirty_requests = 0
+        self.shape_updates = 0
+
+    def mark_dirty(self, rect):
+        self.dirty_requests += 1
+        self.update(rect)  # Qt merges all dirty rectangles into one paint event
+
+    def set_frame_rect(self, rect):
+        self.mark_dirty(self.frame_rect)
+        self.frame_rect = QRect(rect)
+        self.mark_dirty(self.frame_rect)
+        self.update_shape()
+
+    def set_frame(self, image):
+        self.frame = image
+        self.mark_dirty(self.frame_rect)
+        self.update_shape()
+
+    def add_item(self, item):
+        self.items.append(item)
+        self.mark_dirty(item.rect)
+        self.schedule_tick()
+        self.update_shape()
+        return item
+
+    def remove_item(self, item):
+        if item in self.items:
+            self.items.remove(item)
+            self.mark_dirty(item.rect)
+            self.schedule_tick()
+            self.update_shape()
+
+    def move_item(self, item, rect):
+        self.mark_dirty(item.rect)
+        item.rect = QRect(rect)
+        self.mark_dirty(item.rect)
+        self.update_shape()
+
+    # Shape the window to the frame's visible pixels and the overlays' rectangles (only when that changes)
+    # Without a frame the previous shape is kept: an empty mask would make the whole window clickable again
+    def update_shape(self):
+        if self.frame is None:
+            return
+        region = alpha_region(self.frame, self.frame_rect.width(), self.frame_rect.height())
+        region = region.translated(self.frame_rect.topLeft())
+        for item in self.items:
+            region = region.united(item.rect)
+        if region == self.shape:
+            return
+        self.shape = region
+        self.window().setMask(region)
+        self.shape_updates += 1
+
+    # Extend an item's lifetime (e.g. a repeated tip) without repainting it
+    def restart_item(self, item, duration=None):
+        item.restart(duration)
+        self.schedule_tick()
+
+    # Arm the timer for the next fade step or the earliest expiry, or stop it when nothing is pending
+    def schedule_tick(self):
+        if any(item.fade and item.duration is not None for item in self.items):
+            delay = FADE_INTERVAL
+        else:
+            expiries = [item.expires_at() for item in self.items if item.duration is not None]
+            if not expiries:
+                self.timer.stop()
+                return
+            delay = max(0, int((min(expiries) - time.monotonic()) * 1000) + 1)
+        self.timer.start(delay)
+
+    def tick(self):
+        now = time.monotonic()
+        expired = False
+        for item in list(self.items):
+            if not item.advance(now):
+                self.items.remove(item)
+                self.mark_dirty(item.rect)
+                expired = True
+            elif item.fade:
+                self.mark_dirty(item.rect)
+        self.schedule_tick()
+        if expired:
+            self.update_shape()
+
+    # Draw the frame and the overlays that intersect the dirty region, in a single pass
+    def paintEvent(self, event):
+        started = time.perf_counter() if DIAGNOSTICS.enabled else None
+        self.paint_count += 1
+        region = event.region()
+        for rect in region.rects():
+            self.painted_pixels += rect.width() * rect.height()
+        painter = QPainter(self)
+        if self.frame is not None and region.intersects(self.frame_rect):
+            painter.drawImage(self.frame_rect.topLeft(), self.frame)
+        for item in self.items:
+            if item.opacity > 0 and region.intersects(item.rect):
+                painter.setOpacity(item.opacity)
+                if hasattr(item.image, "toImage"):
+                    painter.drawPixmap(item.rect.topLeft(), item.image)
+                else:
+                    painter.drawImage(item.rect.topLeft(), item.image)
+        painter.end()
+        if started is not None:
+            DIAGNOSTICS.record("paint_ms", (time.perf_counter() - started) * 1000)
+            DIAGNOSTICS.record("overlays", len(self.items))
+
+    def stats(self):
+        shape_pixels = sum(rect.width() * rect.height() for rect in self.shape.rects()) if self.shape is not None else 0
+        return {"paints": self.paint_count, "painted_pixels": self.painted_pixels,
+                "dirty_requests": self.dirty_requests, "overlays": len(self.items),
+                "shape_updates": self.shape_updates, "shape_pixels": shape_pixels,
+                "window_pixels": self.width() * self.height(),
+                "shape_builds": shape_builds, "shape_hits": shape_hits}
@@ -0,0 +1,48 @@
+'''
+Convert the GIFs in assets/ into memory-mapped sprite sheets (see sprite_sheet.py).
+
+python convert_assets.py                 # 150×150 sheets for every GIF (the default window size)
+python convert_assets.py --size 150 300  # one sheet per pixel size (e.g. for --size 150 on a 2× screen)
+python convert_assets.py --size 0        # sheets at the original 720×720 size
+
+The pet picks up a sheet matching its frame size in device pixels, then a sheet
+at the original size, then the GIF. Sheets are ignored once their GIF changes,
+so re-run this after editing an asset.
+'''
+
+import argparse                                 # Import the command line argument parser
+import glob                                     # Find the GIFs in assets/
+import os                                       # Import the operating system module and process the file path
+import sys                                      # Import system modules
+from PyQt5.QtGui import QGuiApplication          # Image scaling needs a GUI application object
+from frame_cache import decode_animation, scale_animation  # Decode and scale the GIF frames
+import sprite_sheet                              # The sprite-sheet writer
+
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+
+def convert(path, sizes, directory):
+    animation = decode_animation(path)
+    if animation is None:
+        print(f"Skipped {path}: cannot be decoded")
+        return
+    for size in sizes:
+        frames = animation if not size else scale_animation(animation, size, size)
+        target = sprite_sheet.sprite_path(path, size or None, directory)
+        sprite_sheet.write_sprite_sheet(target, frames.frames, frames.delays, path)
+        print(f"{os.path.basename(path)} -> {os.path.relpath(target)} "
+              f"({len(frames)} frames, {os.path.getsize(target) // 1024} KiB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert GIF assets into memory-mapped sprite sheets")
+    parser.add_argument("assets", nargs="*", help="files to convert (default: every GIF in assets/)")
+    parser.add_argument("--size", type=int, nargs="+", default=[150],
+                        help="frame sizes in device pixels, 0 for the original size (default: 150)")
+    parser.add_argument("--output", default=sprite_sheet.SPRITE_DIR, help="output directory (default: assets/sprites)")
+    args = parser.parse_args()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # No window is needed
+    app = QGuiApplication(sys.argv[:1])
+    for path in args.assets or sorted(glob.glob(os.path.join(ASSETS_DIR, "*.gif"))):
+        convert(path, args.size, args.output)
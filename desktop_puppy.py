@@ -10,6 +10,8 @@
 20:00-23:00 → game
 Otherwise → idle
 
+The state follows the schedule while running, and the hours can be replaced with --schedule schedule.json
+
 
 2. Right-click context menu features:
 
@@ -41,55 +43,128 @@ and a heart animation is triggered There is a 1-minute cooldown after a successf
 
 
 
+import time                                     # Import time module for the startup timing
+STARTUP_BEGIN = time.perf_counter()             # Start of the startup timing, before the other imports
 import sys                                      # Import system modules
-import random                                   # Import a random module to generate random numbers
-import time                                     # Import time module for recording time
 import os                                       # Import the operating system module and process the file path
-from datetime import datetime, date             # Import date and time classes
-from PyQt5.QtCore import Qt, QTimer, QPropertyAnimation  # Import core modules (timer, animation, etc.)
-from PyQt5.QtGui import QMovie, QPixmap, QCursor   # Import graphics module (gif animation, pictures, cursor)
+import argparse                                 # Import the command line argument parser
+import signal                                   # Quit cleanly on SIGTERM while recording
+from datetime import datetime                   # Import date and time classes
+from PyQt5.QtCore import Qt, QEvent, QRect, QTimer  # Import core modules (events, geometry, timer, etc.)
+from PyQt5.QtGui import QCursor                   # Import graphics module (cursor)
 from PyQt5.QtWidgets import (                     # Import widgets
-    QApplication, QLabel, QMainWindow, QMenu, QAction,
-    QInputDialog, QMessageBox, QGraphicsOpacityEffect
+    QApplication, QMainWindow, QMenu, QAction,
+    QInputDialog, QMessageBox
 )
+from frame_cache import FramePlayer, shared_frame_cache  # Import the shared decoded-frame cache and its player
+from prefetch import prefetcher_for                       # Import the background decoder of the likely next animations
+from dragging import DragController                       # Import the coalescing window-drag controller
+from animation_scheduler import AnimationScheduler       # Import the visibility- and power-aware animation scheduler
+from schedule import Schedule, ScheduleTimer             # Import the time-range schedule and its boundary timer
+from pet_engine import PetEngine, Outcome                # Import the Qt-free mood/energy rules
+from compositor import PetCanvas                         # Import the single-pass frame and overlay compositor
+from overlays import OverlayManager                      # Import the heart/tip/warning/bubble overlays
+from pet_manager import PetManager                       # Import the multi-pet manager
+from state_journal import StateJournal                   # Import the write-behind journal that keeps mood and energy across restarts
+from diagnostics import DIAGNOSTICS                      # Import the hot-path histograms (off unless enabled)
+from input_trace import TraceRecorder                    # Import the input recorder (replayed with input_trace.py)
+from event_log import EVENT_LOG, DEBUG, INFO, parse_level  # Import the non-blocking structured event log
+from sprite_sheet import find_sprite                     # Import the lookup of converted sprite sheets
+
+
+# Startup timing breakdown, printed once startup is complete when --startup-timing or PUPPY_STARTUP_TIMING=1 is given
+STARTUP_TIMING = os.environ.get("PUPPY_STARTUP_TIMING", "") not in ("", "0")
+startup_marks = []
+
+# Finish startup even if no paint event arrives (e.g. the window manager keeps the window hidden), in milliseconds
+FIRST_PAINT_TIMEOUT = 500
+
+
+# Record the end of a startup phase (only the first time, when several pets start together)
+def mark_startup(name):
+    if all(mark != name for mark, _ in startup_marks):
+        startup_marks.append((name, time.perf_counter()))
+
+
+# Format the startup phases as "name: ms" lines
+def startup_report():
+    lines = ["Startup timing:"]
+    previous = STARTUP_BEGIN
+    for name, stamp in startup_marks:
+        lines.append(f"  {name:<14}{(stamp - previous) * 1000:8.1f} ms")
+        previous = stamp
+    lines.append(f"  {'total':<14}{(previous - STARTUP_BEGIN) * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+mark_startup("imports")
+
+
+# Expose an attribute of the pet engine as an attribute of the window (e.g. self.mood)
+def engine_attribute(name):
+    return property(lambda self: getattr(self.engine, name),
+                    lambda self, value: setattr(self.engine, name, value))
 
 # Define the desktop pet main window class, inherited from QMainWindow
 class DesktopPet(QMainWindow):
-    def __init__(self):
+    # The pet's state lives in the engine; these stay available on the window for the display code
+    status = engine_attribute("status")
+    mood = engine_attribute("mood")
+    energy = engine_attribute("energy")
+    last_sleep_time = engine_attribute("last_sleep_time")
+    reset_chance = engine_attribute("reset_chance")
+    last_reset_date = engine_attribute("last_reset_date")
+
+    # position: top-left corner on the desktop (default: lower right corner of the primary screen)
+    # status: initial state (default: from the schedule); frame_clock: a FrameClock shared with other pets (see pet_manager.py)
+    # snap_distance: dropping the pet within this many pixels of a screen edge snaps it to the edge (0 disables)
+    # journal: a StateJournal the mood, energy and reset quota are restored from and saved to (None: not kept)
+    # recorder: a TraceRecorder that writes every input to a trace file (see input_trace.py)
+    # cursor_monitor: a CursorMonitor shared with other pets, so they share one idle poll (see pet_manager.py)
+    def __init__(self, window_size=150, idle_timeout=300, schedule=None, position=None, status=None, frame_clock=None,
+                 snap_distance=0, journal=None, recorder=None, cursor_monitor=None):
         super().__init__()  # Initialize the parent class
         
-        # Define the main window pixel size (150 pixels in width and height)
-        self.window_size = 150
+        # Define the main window pixel size (150 pixels in width and height by default, configurable with --size)
+        self.window_size = window_size
         
         # Define the target size of the love animation (the original image is 360×360, which will be scaled to the specified size to display)
         self.heart_target_size = 60
         
-        # Set reset reset chances that are only allowed once a day
-        self.reset_chance = 1
-        self.last_reset_date = date.today()  # Record the date of the last reset
-        
-        # Record the last successful time to increase mood by double-clicking (used to increase mood by 1 minute cooling when double-clicking)
-        self.last_successful_double_click = 0
-        
         # Get the desktop available area and position the window in the lower right corner, but leave 20 pixels on the right without sticking it
-        screen_geometry = QApplication.desktop().availableGeometry()  # Get the screen available area (exclude taskbar)
-        x = screen_geometry.width() - self.window_size - 20         # Calculate x coordinates: Leave 20px on the right
-        y = screen_geometry.height() - self.window_size                # Calculate y coordinates
-        self.move(x, y)         # Move the window to the specified location
+        if position is None:
+            screen_geometry = QApplication.desktop().availableGeometry()  # Get the screen available area (exclude taskbar)
+            x = screen_geometry.width() - self.window_size - 20         # Calculate x coordinates: Leave 20px on the right
+            y = screen_geometry.height() - self.window_size                # Calculate y coordinates
+            position = (x, y)
+        self.move(*position)    # Move the window to the specified location
+        # Dragging moves the window at most once per display refresh, however fast the mouse reports
+        self.drag = DragController(self, snap_distance)
         
         
-        # Initialize pet status variables: Set the initial state according to the current time, and set the mood and physical strength values ​​at the same time.
-        self.status = self.get_time_based_status()  # Initial state (study, sleep, guitar, game, idle)
-        self.mood = 5          # Set the initial mood value to 5 (the range is 0~5, and it will automatically enter the idle state when it is 0)
-        self.energy = 5        # Set the initial physical strength value to 5 (the range is 0~5, and it will automatically enter the sleep state when it is 0)
-        self.last_sleep_time = None  # Used to record the start time of a pet entering sleep state
+        # The time ranges used for automatic state switching (the built-in hours unless a schedule file is given)
+        self.schedule = schedule if schedule is not None else Schedule()
         
-        # Initialize double-click to touch related variables
-        self.pet_touch_count = 0                                # Cumulative number of double-click strokes
-        self.double_click_threshold = random.randint(3, 8)        # Randomly generated trigger to increase mood by double-clicking (3 to 8 times)
-        self.last_double_click_time = 0                          # Record the last double-click time
+        # Initialize pet status: the initial state follows the current time, mood and energy start at 5 (the range is 0~5)
+        # The engine also keeps the double-click petting counters and the once-a-day reset chance
+        self.engine = PetEngine(status=status or self.get_time_based_status())
+        # Continue with the mood, energy and reset quota of the last run, so restarting does not refill them
+        self.journal = journal
+        if journal is not None:
+            self.engine.restore(journal.load())
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.start(self)
         
-        self.bubble_label = None     # Tags used to display the "Say something" input bubble
+        # Heart, tips, warnings and the "Say something" bubble, all drawn by the canvas in one pass
+        self.overlays = OverlayManager(self, self.heart_target_size)
+        
+        # Decoded GIF frames are shared through one cache, so switching back to a state needs no disk I/O or decoding
+        self.frame_cache = shared_frame_cache()
+        self.prefetcher = prefetcher_for(self.frame_cache)
+        self.player = FramePlayer(self, clock=frame_clock)
+        self.player.frameChanged.connect(self.show_frame)
+        # Pause the animation while the window is hidden or covered, and slow it down for sleep or an idle user (after idle_timeout seconds)
+        self.scheduler = AnimationScheduler(self, self.player, idle_timeout=idle_timeout, monitor=cursor_monitor)
         
         # Set window properties: no border, always topped, transparent background and displayed as a separate window
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Window | Qt.NoDropShadowWindowHint)
@@ -97,164 +172,167 @@ class DesktopPet(QMainWindow):
         self.setAutoFillBackground(False)
 
         
-        # Initialize the main tag (used to display gif animations), allowing content to automatically scale
-        self.label = QLabel(self)
-        self.label.setScaledContents(True)  # Allows automatic scaling of tag content
-        self.setCentralWidget(self.label)   # Set label as the center component of the window
-        self.setFixedSize(self.window_size, self.window_size)  # Fixed window size
+        # Initialize the canvas that draws the gif animation and all overlays in a single paint
+        # Frames are scaled once to the window's device-pixel size when they are loaded, so nothing is rescaled on paint
+        self.canvas = PetCanvas(self)
+        self.canvas.set_frame_rect(QRect(0, 0, self.window_size, self.window_size))
+        self.setCentralWidget(self.canvas)  # Set canvas as the center component of the window
+        self.setFixedSize(self.window_size, self.window_size)  # Fixed window size (grows while a bubble is shown)
+        
+        # Show the first frame of the current state right away (only that frame is decoded);
+        # the full animation and the rest of the setup are loaded in finish_startup() once it is on screen
+        self.startup_finished = False
+        self.first_frame_painted = False
+        first_frame = self.frame_cache.first_frame(self.get_gif_path(), *self.frame_size())
+        if first_frame is not None:
+            self.canvas.set_frame(first_frame)
+        self.canvas.installEventFilter(self)
         
         self.show()            # Display window
-        self.repaint()
         self.raise_()          # Place the window on top
         self.activateWindow()  # Activate the window to gain focus
-        
-        # Load the gif animation corresponding to the current state
-        self.label.clear()
-        self.label.setStyleSheet("background: transparent;")
-        self.update_gif()
+        QTimer.singleShot(FIRST_PAINT_TIMEOUT, self.finish_startup)
         
         # Set the right-click menu: Call the open_menu() method when right-clicking
         self.setContextMenuPolicy(Qt.CustomContextMenu)
         self.customContextMenuRequested.connect(self.open_menu)
         
-        # Setting up mouse events:
-        # Bind the left-click event to self.label, to increase mood
-        self.label.mouseDoubleClickEvent = self.mouseDoubleClickEvent
-        # At the same time, the drag window function is implemented, and it is implemented by rewriting mousePressEvent and mouseMoveEvent
+        # Setting up mouse events: the canvas does not handle mouse events, so double-clicks (to increase mood), presses and moves
+        # (to drag the window) reach mouseDoubleClickEvent, mousePressEvent and mouseMoveEvent of the window
+
+    # The first paint of the canvas means the first frame is on screen: finish the rest of the startup right after it
+    def eventFilter(self, obj, event):
+        if obj is self.canvas and event.type() == QEvent.Paint and not self.first_frame_painted:
+            self.first_frame_painted = True
+            mark_startup("first frame")
+            QTimer.singleShot(0, self.finish_startup)
+        return super().eventFilter(obj, event)
+
+    # Second half of the startup: start the animation of the current state and follow the schedule
+    def finish_startup(self):
+        if self.startup_finished:
+            return
+        self.startup_finished = True
+        self.canvas.removeEventFilter(self)
+        self.update_gif()  # Load the gif animation corresponding to the current state
+        
+        # Follow the schedule while running: one single-shot timer is armed for the next time boundary, no clock polling
+        self.schedule_timer = ScheduleTimer(self.schedule, self)
+        self.schedule_timer.statusChanged.connect(self.on_schedule_changed)
         
-        # Print window initialization debug information to terminal
-        print('Window initialization completed')
-        print("Window geometry:", self.geometry())
-        print("Is window visible:", self.isVisible())
-        print("Window size:", self.size())
+        if STARTUP_TIMING and all(mark != "rest" for mark, _ in startup_marks):
+            mark_startup("rest")
+            EVENT_LOG.info("startup_timing", startup_report())
 
-    # Return to the initial state according to the current time
+    # Return to the state the schedule gives for the current time (by default: 23-12 sleep, 12-19 study, 19-20 guitar, 20-23 game)
     def get_time_based_status(self):
-        now = datetime.now().hour  # Get the current hour
-        if 23 <= now or now < 12:
-            return "sleep"       # Sleep state from 23:00 to 11:59
-        elif 12 <= now < 19:
-            return "study"       # 12:00 to 18:59 in study status
-        elif 19 <= now < 20:
-            return "guitar"      # 19:00 to 19:59 in guitar status
-        elif 20 <= now < 23:
-            return "game"        # 20:00 to 22:59 in game state
-        return "idle"            # The default time is idle status
+        return self.schedule.status_at(datetime.now())
+
+    # Called when the schedule reaches a time boundary: switch to the new state like a manual switch would
+    def on_schedule_changed(self, new_status):
+        self.record_input("schedule", new_status)
+        if new_status != self.status:
+            self.set_status(new_status)
 
     # Return the corresponding gif file path according to the current status and mood
+    # A sprite sheet converted with convert_assets.py is preferred when present (no GIF decoding needed)
     def get_gif_path(self):
+        return self.asset_path(self.status, self.get_mood_suffix())
+
+    # The asset shown for a state and mood suffix (also used to predict the next asset, see prefetch.py)
+    def asset_path(self, status, mood_suffix):
         base = os.path.dirname(__file__)  # Get the directory where the current file is located
-        if self.status == "study":
-            return os.path.join(base, "assets", f"study_{self.get_mood_suffix()}.gif")
-        elif self.status == "game":
-            return os.path.join(base, "assets", f"game_{self.get_mood_suffix()}.gif")
-        elif self.status == "guitar":
-            return os.path.join(base, "assets", "guitar.gif")
-        elif self.status == "sleep":
-            return os.path.join(base, "assets", "sleep.gif")
-        elif self.status == "idle":
-            return os.path.join(base, "assets", "idle.gif")
+        if status == "study":
+            path = os.path.join(base, "assets", f"study_{mood_suffix}.gif")
+        elif status == "game":
+            path = os.path.join(base, "assets", f"game_{mood_suffix}.gif")
+        elif status == "guitar":
+            path = os.path.join(base, "assets", "guitar.gif")
+        elif status == "sleep":
+            path = os.path.join(base, "assets", "sleep.gif")
+        elif status == "idle":
+            path = os.path.join(base, "assets", "idle.gif")
         else:
-            return os.path.join(base, "assets", "idle.gif")
+            path = os.path.join(base, "assets", "idle.gif")
+        (pixel_size, _), _ = self.frame_size()
+        return find_sprite(path, pixel_size) or path
 
     # Select the suffix based on the current mood value, which is used to select the correct GIF group (bad, normal, happy)
     def get_mood_suffix(self):
-        if self.mood <= 1:
-            return "bad"
-        elif self.mood >= 5:
-            return "happy"
-        else:
-            return "normal"
+        return self.engine.mood_suffix()
 
     # The modified update gif() function is used to load and display gifs to prevent residual problems in the first frame.
     def update_gif(self):
         path = self.get_gif_path()  # Get the path to the GIF file that should be displayed currently
-        # If an old movie object exists, stop the animation and clear the contents of the label
-        if hasattr(self, "movie") and self.movie:
-            self.movie.stop()
-            self.label.clear()
+        # Stop the old animation and clear the frame
+        self.player.stop()
+        self.canvas.set_frame(None)
         self.current_gif_path = path  # Save the current gif path
-        self.movie = QMovie(path)      # Create a new q movie instance to load gif
-        if not self.movie.isValid():
+        # Decoded frames pre-scaled to the window size in device pixels, taken from the cache when already loaded
+        # (usually decoded in the background already because the prefetcher predicted this transition)
+        started = time.perf_counter() if DIAGNOSTICS.enabled else None
+        animation = self.prefetcher.fetch(path, *self.frame_size())
+        if started is not None:
+            DIAGNOSTICS.record("switch_ms", (time.perf_counter() - started) * 1000)
+        if animation is None:
             return  # Exit if loading fails
-        # Start the animation and force it to return to the first frame to avoid residual phenomena
-        self.movie.start()
-        self.movie.jumpToFrame(0)
-        self.label.setMovie(self.movie)  # Set the new animation to the tag
-        self.movie.setSpeed(100)           # Set animation playback speed
+        # Start the animation from the first frame to avoid residual phenomena
+        self.player.set_animation(animation)
+        self.player.setSpeed(100)          # Set animation playback speed
+        self.scheduler.set_status(self.status)  # Apply the frame-rate policy of the new state
+        self.player.start()
+        self.prefetcher.prefetch_for(self)  # Decode the likely next animations in the background
+
+    # The size frames are scaled to: the window size in device pixels, and the device pixel ratio
+    def frame_size(self):
+        dpr = self.devicePixelRatioF()
+        pixel_size = round(self.window_size * dpr)
+        return (pixel_size, pixel_size), dpr
+
+    # Display a frame of the current animation (only the frame's rectangle is repainted)
+    def show_frame(self, frame_number):
+        image = self.player.current_image()
+        if image is not None:
+            self.canvas.set_frame(image)
 
     # State switching method, adjust mood and physical strength according to the target state, and update animation display at the same time
     def set_status(self, new_status):
+        outcome = self.engine.set_status(new_status)
+        self.save_state()
         # If the target state is consistent with the current state, only prompt information is displayed
-        if new_status == self.status:
-            state_messages = {
-                "study": "You are studying now!",
-                "guitar": "Immersing in music...",
-                "game": "Don't play too much game!",
-                "sleep": "Already Zzz",
-                "idle": "Do something..."
-            }
-            msg = state_messages.get(new_status, "")
-            self.show_state_tip(msg)  # Show prompts in the window
-            print(msg)
+        if outcome.kind == Outcome.SAME:
+            self.show_state_tip(outcome.message)  # Show prompts in the window
+            self.log_event("same_status", outcome.message)
+            return
+        # Not enough mood or energy for the target state: show a warning and stay in the current state
+        if outcome.kind == Outcome.REJECTED:
+            self.show_warning(outcome.message)
+            self.log_event("rejected", outcome.message, requested=new_status)
             return
-
-        # If you are currently in sleep and switch to other states, you will restore your mood and physical strength based on the length of sleep.
-        if self.status == "sleep" and new_status != "sleep" and self.last_sleep_time:
-            sleep_duration = time.time() - self.last_sleep_time
-            if sleep_duration >= 3600:
-                self.energy = 5
-                self.mood = min(5, self.mood + 2)
-            else:
-                self.energy = min(5, self.energy + 2)
-            self.last_sleep_time = None
-
-        # For switching to study state, the mood and physical strength are required to be at least 2, otherwise the prompt will fail.
-        if new_status == "study":
-            if self.mood < 2:
-                self.show_warning("Don't have enough mood")
-                print("Don't have enough mood")
-                return
-            if self.energy < 2:
-                self.show_warning("Don't have enough energy")
-                print("Don't have enough energy")
-                return
-            self.mood = max(0, self.mood - 2)
-            self.energy = max(0, self.energy - 1)
-        elif new_status == "guitar":
-            if self.energy == 0:
-                self.show_warning("Energy too low!")
-                print("Energy too low!")
-                return
-            self.mood = min(5, self.mood + 1)
-            self.energy = max(0, self.energy - 1)
-        elif new_status == "game":
-            if self.energy == 0:
-                self.show_warning("Energy too low!")
-                print("Energy too low!")
-                return
-            self.mood = min(5, self.mood + 2)
-        elif new_status == "sleep":
-            if not self.last_sleep_time:
-                self.last_sleep_time = time.time()
-        elif new_status == "idle":
-            # Increase 1 point of physical strength when switching to idle state
-            self.energy = min(5, self.energy + 1)
-
-        # Automatic rules: If the mood drops to 0, it will automatically enter idle; if the physical strength drops to 0, it will automatically enter sleep
-        if self.mood == 0:
-            self.status = "idle"
-        elif self.energy == 0:
-            self.status = "sleep"
-            if not self.last_sleep_time:
-                self.last_sleep_time = time.time()
-        else:
-            self.status = new_status
         
-        print(f"Switched to {self.status}. ")
+        self.log_event("switched", f"Switched to {self.status}. ")
         self.print_status_message()   # Output current status information to the terminal
         self.update_gif()             # Update gif animation display
 
+    # A state chosen from the context menu
+    def choose_status(self, status):
+        self.record_input("status", status)
+        self.set_status(status)
+
+    # Write an input to the trace when recording
+    def record_input(self, kind, *args):
+        if self.recorder is not None:
+            self.recorder.record(kind, *args)
+
+    # Queue a structured record with the pet's state, mood and energy for the event log (written by its thread, never blocks)
+    def log_event(self, event, message, level=INFO, **fields):
+        EVENT_LOG.log(level, event, message, state=self.status, mood=self.mood, energy=self.energy, **fields)
+
+    # Queue the current mood, energy and reset quota for the journal (written in the background, never blocks)
+    def save_state(self):
+        if self.journal is not None:
+            self.journal.record(self.engine.state())
+
     # Output current status information (mood, physical strength and prompts) to the terminal
     def print_status_message(self):
         mood_suffix = self.get_mood_suffix()
@@ -264,30 +342,16 @@ class DesktopPet(QMainWindow):
             status_msg = "Your puppy is at a good mood ૮ ˶′ﻌ ‵˶ ა"
         else:
             status_msg = "Please pet your puppy ૮ ◞ ﻌ ◟ ა"
-        print(f"Mood: {self.mood}, Energy: {self.energy}. {status_msg}")
+        self.log_event("status", f"Mood: {self.mood}, Energy: {self.energy}. {status_msg}")
 
-    # Show warning labels (black text), such as "under energy" or "under mood"
+    # Show warning labels (black text), such as "under energy" or "under mood", in the center of the window for 2 seconds
     def show_warning(self, message):
-        warn_label = QLabel(message, self)
-        warn_label.setStyleSheet("color: black; font-size: 16px; background-color: rgba(255,255,255,0.7);")
-        warn_label.setWordWrap(True)
-        warn_label.adjustSize()
-        # Place the warning label in the center of the window
-        warn_label.move((self.width() - warn_label.width()) // 2,
-                        (self.height() - warn_label.height()) // 2)
-        warn_label.show()
-        QTimer.singleShot(2000, warn_label.deleteLater)  # Automatically deleted after 2 seconds
+        self.overlays.show_tip(message)
 
     # When the request switches to the same as the current state, the corresponding prompt information is displayed
+    # Repeating a tip that is still visible (e.g. double-clicking during the cooldown) keeps that tip instead of stacking a new one
     def show_state_tip(self, message):
-        tip_label = QLabel(message, self)
-        tip_label.setStyleSheet("color: black; font-size: 16px; background-color: rgba(255,255,255,0.7);")
-        tip_label.setWordWrap(True)
-        tip_label.adjustSize()
-        tip_label.move((self.width() - tip_label.width()) // 2,
-                       (self.height() - tip_label.height()) // 2)
-        tip_label.show()
-        QTimer.singleShot(2000, tip_label.deleteLater)
+        self.overlays.show_tip(message)
 
     # Right-click menu, including: Change Status, Say something..., Show Status, Clear bubble, Reset, Quit
     # Menu arrangement requires Reset to be above Quit (the second to last item)
@@ -298,7 +362,7 @@ class DesktopPet(QMainWindow):
         change_status_menu = menu.addMenu("Change Status")
         for state in ["study", "guitar", "game", "sleep", "idle"]:
             action = QAction(state.capitalize(), self)
-            action.triggered.connect(lambda checked, s=state: self.set_status(s))
+            action.triggered.connect(lambda checked, s=state: self.choose_status(s))
             change_status_menu.addAction(action)
         
         # Add Say something... option
@@ -321,6 +385,12 @@ class DesktopPet(QMainWindow):
         reset_action.triggered.connect(self.reset_status)
         menu.addAction(reset_action)
         
+        # Hidden Diagnostics option: only shown while Shift is held
+        if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+            diagnostics_action = QAction("Diagnostics", self)
+            diagnostics_action.triggered.connect(self.show_diagnostics)
+            menu.addAction(diagnostics_action)
+        
         # Add Quit option (bottom)
         quit_action = QAction("Quit", self)
         quit_action.triggered.connect(self.close)
@@ -328,32 +398,58 @@ class DesktopPet(QMainWindow):
         
         menu.exec_(QCursor.pos())  # Display menu in the current mouse position
 
+    # Show the hot-path histograms (switch, decode and paint times, overlays, event-loop lag), turning them on if needed
+    def show_diagnostics(self):
+        if not DIAGNOSTICS.enabled:
+            DIAGNOSTICS.enable()
+            QMessageBox.information(self, "Diagnostics", "Diagnostics are on now. Open this again later to see the data.")
+            return
+        box = QMessageBox(QMessageBox.Information, "Diagnostics", DIAGNOSTICS.report(), QMessageBox.Ok, self)
+        box.setInformativeText(f"Times in ms. kill -USR1 {os.getpid()} writes them to {DIAGNOSTICS.dump_path}")
+        font = box.font()
+        font.setFamily("monospace")
+        box.setFont(font)
+        box.exec_()
+
+    # Counters of the animation (frames rendered and skipped, cursor polls) and of the canvas (paints, shape updates)
+    def stats(self):
+        return {"animation": self.scheduler.stats(), "canvas": self.canvas.stats()}
+
     # Display the "Say something..." input box
     def show_bubble_input(self):
         text, ok = QInputDialog.getText(self, "Talk", "Enter something (max 10 chars):")
         if ok and text.strip():
             self.show_bubble(text[:10])
     
-    # Display input bubbles in the top window directly below the table pet, supporting automatic line wrapping
+    # Display the input bubble directly below the pet (above it if there is no room below), supporting automatic line wrapping
+    # The bubble is drawn by the canvas, so the window grows by the bubble's height instead of opening a second window
     def show_bubble(self, text):
-        if self.bubble_label:
-            self.bubble_label.close()
-        self.bubble_label = QLabel(text)
-        self.bubble_label.setStyleSheet("background-color: white; border: 1px solid gray; padding: 4px;")
-        self.bubble_label.setWordWrap(True)
-        self.bubble_label.adjustSize()
-        pet_global = self.mapToGlobal(self.rect().bottomLeft())
-        bubble_x = pet_global.x() + (self.width() - self.bubble_label.width()) // 2
-        bubble_y = pet_global.y()
-        self.bubble_label.move(bubble_x, bubble_y)
-        self.bubble_label.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool)
-        self.bubble_label.show()
+        self.record_input("bubble", text)
+        self.overlays.set_bubble(text)
+        self.layout_canvas()
     
     # Clear input bubble display
     def clear_bubble(self):
-        if self.bubble_label:
-            self.bubble_label.close()
-            self.bubble_label = None
+        self.record_input("clear_bubble")
+        self.overlays.clear_bubble()
+        self.layout_canvas()
+
+    # Resize the window for the bubble and place the pet and the bubble inside it, keeping the pet where it is on screen
+    def layout_canvas(self):
+        bubble = self.overlays.bubble
+        extra = bubble.rect.height() if bubble is not None else 0
+        pet_x = self.x() + self.canvas.frame_rect.x()
+        pet_y = self.y() + self.canvas.frame_rect.y()
+        screen_geometry = QApplication.desktop().availableGeometry(self)
+        above = bubble is not None and pet_y + self.window_size + extra > screen_geometry.bottom()
+        frame_y = extra if above else 0
+        if frame_y != self.canvas.frame_rect.y():
+            self.overlays.shift(frame_y - self.canvas.frame_rect.y())
+            self.canvas.set_frame_rect(QRect(0, frame_y, self.window_size, self.window_size))
+        self.setFixedSize(self.window_size, self.window_size + extra)
+        self.move(pet_x, pet_y - frame_y)
+        if bubble is not None:
+            self.overlays.place_bubble(0 if above else self.window_size)
 
     # Display the status window to display the current mood, physical strength and status prompts in the form of a dialog box
     def show_status_window(self):
@@ -369,101 +465,137 @@ class DesktopPet(QMainWindow):
     
     # Reset function: Only once a day, please reset your mood and physical strength after asking the user, and re-judgment the status based on the current time.
     def reset_status(self):
-        today = date.today()
-        if today != self.last_reset_date:
-            self.reset_chance = 1
-            self.last_reset_date = today
-        prompt = f"Do you want to reset all status?\nToday's reset chance: {self.reset_chance}/1"
+        prompt = f"Do you want to reset all status?\nToday's reset chance: {self.engine.resets_left()}/1"
         reply = QMessageBox.question(self, "Reset", prompt, QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            if self.reset_chance > 0:
-                self.mood = 5
-                self.energy = 5
-                self.status = self.get_time_based_status()  # Re-judgment of the status based on the current time
-                self.reset_chance -= 1  # Use a reset chance
-                print("Reset successfully! Full mood and energy now!")
+            # Re-judgment of the status based on the current time
+            status = self.get_time_based_status()
+            self.record_input("reset", status)
+            if self.apply_reset(status):
                 QMessageBox.information(self, "Reset", "Reset successfully!")
-                self.print_status_message()
-                self.update_gif()
             else:
-                print("No chance to reset... Just enjoy your day!")
                 QMessageBox.information(self, "Reset", "No chance to reset... Just enjoy your day!")
         else:
             pass  # The user chooses not to reset and does not perform any operations
 
+    # Reset to full mood and energy in the given state if today's reset is still available; return whether it was
+    def apply_reset(self, status):
+        outcome = self.engine.reset(status)
+        self.save_state()
+        if outcome.kind != Outcome.RESET:
+            self.log_event("reset_refused", "No chance to reset... Just enjoy your day!")
+            return False
+        self.log_event("reset", "Reset successfully! Full mood and energy now!")
+        self.print_status_message()
+        self.update_gif()
+        return True
+
+    # Stop the animation when the window is closed, so a shared frame clock no longer wakes up for it
+    # The journal writes what is still queued and folds the journal into its snapshot
+    def closeEvent(self, event):
+        self.player.stop()
+        if self.journal is not None:
+            self.journal.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        super().closeEvent(event)
+
     # Drag and move pet function: rewrite the mouse press event, record the offset position relative to the upper left corner of the window when the left mouse button is clicked
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
-            self.drag_position = event.globalPos() - self.frameGeometry().topLeft()
+            self.record_input("press", event.globalPos().x(), event.globalPos().y())
+            self.drag.press(event.globalPos())
             event.accept()
 
     # Drag and move pet function: rewrite mouse move event, update window position according to the current mouse global position
+    # Positions are coalesced, so the window manager gets one geometry request per refresh instead of one per mouse report
     def mouseMoveEvent(self, event):
         if event.buttons() & Qt.LeftButton:
-            self.move(event.globalPos() - self.drag_position)
+            self.record_input("move", event.globalPos().x(), event.globalPos().y())
+            self.drag.move(event.globalPos())
+            event.accept()
+
+    # End of a drag: the final position is applied (and snapped to a nearby screen edge)
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.record_input("release", event.globalPos().x(), event.globalPos().y())
+            self.drag.release()
             event.accept()
 
     # Left-click event: used to increase mood and perform 1 minute cooling judgment at the same time
     def mouseDoubleClickEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            current_time = time.time()
+        if event.button() == Qt.LeftButton and self.canvas.frame_rect.contains(event.pos()):
+            self.record_input("double_click", event.pos().x(), event.pos().y())
+            outcome = self.engine.double_click()
             # If the last time I successfully increase my mood is less than 1 minute away from the current time, the prompt message will be displayed and exited
-            if current_time - self.last_successful_double_click < 60:
+            if outcome.kind == Outcome.COOLDOWN:
                 self.show_state_tip("The fur is getting bald!\ny—̳͟͞͞♥ ૮ ○ﻌ ○ ա")
-                print("Wait a little bit before petting the puppy again—̳͟͞͞♥ ૮ ○ﻌ ○ ա")
+                self.log_event("petting_cooldown", "Wait a little bit before petting the puppy again—̳͟͞͞♥ ૮ ○ﻌ ○ ա")
+                return
+            if outcome.kind == Outcome.COUNTED:
+                self.log_event("double_click", f"Double click count: {self.engine.pet_touch_count} "
+                                               f"Threshold: {self.engine.double_click_threshold}", level=DEBUG,
+                               count=self.engine.pet_touch_count, threshold=self.engine.double_click_threshold)
                 return
-            # If the interval between two double-clicks exceeds 10 minutes, reset the cumulative double-click times and the random threshold.
-            if current_time - self.last_double_click_time > 10 * 60:
-                self.pet_touch_count = 0
-                self.double_click_threshold = random.randint(3, 8)
-            self.pet_touch_count += 1  # Cumulative number of double-clicks
-            self.last_double_click_time = current_time
-            print("Double click count:", self.pet_touch_count, "Threshold:", self.double_click_threshold)
-            # If the cumulative number of double-clicks has reached the randomly set threshold, increase your mood
-            if self.pet_touch_count >= self.double_click_threshold:
-                self.mood = min(5, self.mood + 1)  # Increase mood, but no more than 5
-                print("Pet touched! Mood increased to:", self.mood)
-                self.last_successful_double_click = current_time  # Update the last time to increase mood time
-                self.show_heart()                # Show love animation
-                self.pet_touch_count = 0         # Reset the cumulative number of double-clicks
-                self.double_click_threshold = random.randint(3, 8)  # Regenerate random double-click threshold
-                self.print_status_message()      # Output the current status to the terminal
-                self.update_gif()                # Update gif animation (reflects possible changes in state)
-
-    # Show love animation:
-    # Create a tag to load the love picture, scale it to the set size, make it appear in the middle, and fade out with a gradient animation, the animation duration is 3000 milliseconds
-    # Show love animation (in the middle of the window, automatically fades)
+            # The cumulative number of double-clicks has reached the random threshold: mood increased, counter and threshold start over
+            self.log_event("petted", f"Pet touched! Mood increased to: {self.mood}")
+            self.save_state()
+            self.show_heart()                # Show love animation
+            self.print_status_message()      # Output the current status to the terminal
+            self.update_gif()                # Update gif animation (reflects possible changes in state)
+
+    # Show love animation (in the middle of the pet, fades out in 3 seconds)
+    # The heart picture is scaled once and faded with painter opacity by the canvas, without a widget or graphics effect
     def show_heart(self):
-        heart = QLabel(self)
-        heart.setAttribute(Qt.WA_TransparentForMouseEvents)
-
-        # Loading love pictures
-        heart_path = os.path.join(os.path.dirname(__file__), "assets/heart.png")
-        pixmap = QPixmap(heart_path) 
-        pixmap = pixmap.scaled(self.heart_target_size, self.heart_target_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        heart.setPixmap(pixmap)
-
-        # Use the true width and height of pixmap to center
-        pixmap_size = pixmap.size()
-        x = (self.width() - pixmap_size.width()) // 2
-        y = (self.height() - pixmap_size.height()) // 2
-        heart.setGeometry(x, y, pixmap_size.width(), pixmap_size.height())
-        heart.setStyleSheet("background: transparent;")
-        heart.show()
-
-        # Add fade animation
-        effect = QGraphicsOpacityEffect(heart)
-        heart.setGraphicsEffect(effect)
-        animation = QPropertyAnimation(effect, b"opacity", self)
-        animation.setDuration(3000)  # Animation time 3 seconds
-        animation.setStartValue(1)
-        animation.setEndValue(0)
-        animation.finished.connect(heart.deleteLater)
-        animation.start(QPropertyAnimation.DeleteWhenStopped)
+        self.overlays.show_heart()
 
 
 # Program portal: Create an application and start the main event loop
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    pet = DesktopPet()
+    parser = argparse.ArgumentParser(description="Desktop Puppy")
+    parser.add_argument("--size", type=int, default=150, help="window size in pixels (default: 150)")
+    parser.add_argument("--idle-timeout", type=int, default=300,
+                        help="seconds without input before the animation slows down, 0 to disable (default: 300)")
+    parser.add_argument("--schedule", metavar="PATH", help="JSON file with the time ranges for automatic state switching")
+    parser.add_argument("--startup-timing", action="store_true", help="print a startup timing breakdown")
+    parser.add_argument("--pets", type=int, default=1, help="number of pets to run in this process (default: 1)")
+    parser.add_argument("--no-persist", action="store_true",
+                        help="do not keep mood, energy and the reset quota across restarts")
+    parser.add_argument("--diagnostics", action="store_true",
+                        help="record hot-path histograms from the start (or PUPPY_DIAGNOSTICS=1)")
+    parser.add_argument("--record", metavar="PATH",
+                        help="write every input to a trace file (.gz to compress) for input_trace.py to replay (single pet only)")
+    parser.add_argument("--snap", type=int, default=0, metavar="PX",
+                        help="snap the pet to screen edges it is dropped within PX pixels of (default: 0, off)")
+    parser.add_argument("--log-file", metavar="PATH", default=os.environ.get("PUPPY_LOG_FILE"),
+                        help="also write every event as a JSON line to PATH, rotated at 1 MiB (or PUPPY_LOG_FILE)")
+    parser.add_argument("--log-level", type=str.lower, choices=["debug", "info", "warning", "error"],
+                        default=os.environ.get("PUPPY_LOG_LEVEL", "info").lower(),
+                        help="lowest level written to the terminal and the log file (default: info, or PUPPY_LOG_LEVEL)")
+    args, qt_args = parser.parse_known_args()
+    STARTUP_TIMING = STARTUP_TIMING or args.startup_timing
+    EVENT_LOG.configure(level=parse_level(args.log_level), path=args.log_file)
+    app = QApplication(sys.argv[:1] + qt_args)
+    app.aboutToQuit.connect(EVENT_LOG.close)  # Write what is still queued
+    mark_startup("QApplication")
+    DIAGNOSTICS.install_dump_signal()  # kill -USR1 <pid> writes the histograms to a file
+    if args.diagnostics or os.environ.get("PUPPY_DIAGNOSTICS", "") not in ("", "0"):
+        DIAGNOSTICS.enable()
+    schedule = Schedule.load(args.schedule) if args.schedule else None
+    if args.pets > 1:
+        # Several pets share one frame clock and the decoded frames
+        manager = PetManager(DesktopPet, args.pets, window_size=args.size, idle_timeout=args.idle_timeout, schedule=schedule,
+                             snap_distance=args.snap, persist=not args.no_persist)
+        DIAGNOSTICS.add_source("pets", manager.stats)  # Frame and paint totals in the Diagnostics report and dump
+    else:
+        journal = None if args.no_persist else StateJournal()
+        recorder = TraceRecorder(args.record) if args.record else None
+        pet = DesktopPet(window_size=args.size, idle_timeout=args.idle_timeout, schedule=schedule, snap_distance=args.snap,
+                         journal=journal, recorder=recorder)
+        if recorder is not None:
+            app.aboutToQuit.connect(recorder.close)
+            # kill <pid> ends the recording like Quit; the handler runs once the dump signal's wakeup socket wakes Qt up
+            signal.signal(signal.SIGTERM, lambda *args: app.quit())
+        DIAGNOSTICS.add_source("pet", pet.stats)  # Frame and paint counters in the Diagnostics report and dump
+    mark_startup("window")
     sys.exit(app.exec_())
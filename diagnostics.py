@@ -0,0 +1,221 @@
+'''
+Runtime instrumentation of the hot paths, for finding out why the pet feels laggy.
+
+When enabled, fixed-size histograms collect:
+
+switch_ms     GUI-thread time to switch animations in update_gif (mostly loading/decoding on a cache miss)
+decode_ms     time to decode and scale one asset, on the GUI thread or the prefetch worker
+paint_ms      time of one paintEvent of the pet canvas
+overlays      overlays on screen at each paint
+lag_ms        event-loop lag: how late a 100 ms heartbeat timer fires
+
+Histograms have fixed buckets, so recording is a bisect and an increment and
+memory does not grow. They are not locked: everything is recorded on the GUI
+thread (a prefetched decode when its result is delivered there). Disabled (the
+default), every instrumented call site costs one attribute check and the
+heartbeat timer does not run.
+
+Components that keep counters of their own (the frame cache's hits and
+misses, ...) register them with add_source(); they are counted all the time and
+read only when a report or dump is made.
+
+Enable with --diagnostics or PUPPY_DIAGNOSTICS=1, or from the context menu:
+hold Shift while right-clicking to see the "Diagnostics" entry, which shows the
+histograms and the counters. On Linux and macOS, `kill -USR1 <pid>` writes
+both as JSON to $PUPPY_DIAGNOSTICS_FILE (default:
+desktop_puppy-diagnostics-<pid>.json in the temporary directory).
+'''
+
+import json                                     # Import json for the dump file
+import os                                       # Import the operating system module for the environment and pid
+import signal                                   # The dump signal
+import socket                                   # Wake the event loop up when the signal arrives
+import tempfile                                 # Default location of the dump file
+import time                                     # Import time module for the heartbeat
+from bisect import bisect_left                  # Find the bucket of a value
+from PyQt5.QtCore import Qt, QObject, QTimer, QSocketNotifier  # Import core modules (timer, socket notifier)
+from event_log import EVENT_LOG                  # Report the dump without blocking the event loop
+
+
+# Bucket upper bounds for times in milliseconds (one more bucket holds everything above the last bound)
+LATENCY_BOUNDS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+
+# Bucket upper bounds for counts
+COUNT_BOUNDS = (0, 1, 2, 3, 4, 6, 8, 12, 16)
+
+# The heartbeat timer's interval (ms); how much later it fires is the event-loop lag
+HEARTBEAT_INTERVAL = 100
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    # Upper bound of the bucket holding the given fraction of the values (at most the maximum seen)
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+
+    def clear(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": {(f"<={bound}" if index < len(self.bounds) else f">{self.bounds[-1]}"): count
+                        for index, (bound, count) in enumerate(zip(self.bounds + (None,), self.counts)) if count},
+        }
+
+
+# (key, value) pairs of a dict of counters, nested dicts as "outer.inner" keys
+def flatten(counters, prefix=""):
+    for key, value in counters.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def format_counter(value):
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+
+class Diagnostics(QObject):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = False
+        self.histograms = {
+            "switch_ms": Histogram(LATENCY_BOUNDS),
+            "decode_ms": Histogram(LATENCY_BOUNDS),
+            "paint_ms": Histogram(LATENCY_BOUNDS),
+            "overlays": Histogram(COUNT_BOUNDS),
+            "lag_ms": Histogram(LATENCY_BOUNDS),
+        }
+        self.enabled_at = None
+        self.heartbeat = None         # Created on enable(), once a QApplication exists
+        self.last_beat = None
+        self.sources = {}             # name -> function returning a dict of counters
+        self.notifier = None          # Watches the socket the dump signal writes to
+        self.sockets = None
+        self.dump_path = os.environ.get("PUPPY_DIAGNOSTICS_FILE") or os.path.join(
+            tempfile.gettempdir(), f"desktop_puppy-diagnostics-{os.getpid()}.json")
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.enabled_at = time.time()
+        if self.heartbeat is None:
+            self.heartbeat = QTimer(self)
+            self.heartbeat.setTimerType(Qt.PreciseTimer)
+            self.heartbeat.setInterval(HEARTBEAT_INTERVAL)
+            self.heartbeat.timeout.connect(self.beat)
+        self.last_beat = time.perf_counter()
+        self.heartbeat.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.heartbeat is not None:
+            self.heartbeat.stop()
+
+    def record(self, name, value):
+        self.histograms[name].add(value)
+
+    def beat(self):
+        now = time.perf_counter()
+        self.histograms["lag_ms"].add(max(0.0, (now - self.last_beat) * 1000 - HEARTBEAT_INTERVAL))
+        self.last_beat = now
+
+    def clear(self):
+        for histogram in self.histograms.values():
+            histogram.clear()
+
+    # Report the counters returned by function() under name (a later source with the same name replaces it)
+    def add_source(self, name, function):
+        self.sources[name] = function
+
+    def counters(self):
+        return {name: function() for name, function in self.sources.items()}
+
+    def snapshot(self):
+        return {"enabled": self.enabled, "enabled_at": self.enabled_at, "pid": os.getpid(),
+                "histograms": {name: histogram.summary() for name, histogram in self.histograms.items()},
+                "counters": self.counters()}
+
+    # A short text table for the Diagnostics dialog, followed by the counters of each source
+    def report(self):
+        if not self.enabled:
+            lines = ["Diagnostics are off."]
+        else:
+            lines = [f"{'':<10}{'count':>7}{'mean':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}"]
+            for name, histogram in self.histograms.items():
+                summary = histogram.summary()
+                lines.append(f"{name:<10}{summary['count']:>7}{summary['mean']:>8.2f}{summary['p50']:>8.2f}"
+                             f"{summary['p95']:>8.2f}{summary['p99']:>8.2f}{summary['max']:>8.2f}")
+        for name, counters in self.counters().items():
+            lines.append("")
+            lines.append(name)
+            lines.extend(f"  {key:<30} {format_counter(value)}" for key, value in flatten(counters))
+        return "\n".join(lines)
+
+    def dump(self, path=None):
+        path = path or self.dump_path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    # Dump on SIGUSR1: the signal only wakes a socket up, and the dump runs on the event loop
+    # (a plain Python handler would not run while Qt's event loop is waiting)
+    def install_dump_signal(self, signum=getattr(signal, "SIGUSR1", None)):
+        if signum is None or self.notifier is not None:
+            return  # No such signal on this platform, or already installed
+        receiver, sender = socket.socketpair()
+        receiver.setblocking(False)
+        sender.setblocking(False)
+        signal.set_wakeup_fd(sender.fileno())
+        signal.signal(signum, lambda *args: None)  # The wakeup fd does the work
+        self.sockets = (receiver, sender)
+        self.notifier = QSocketNotifier(receiver.fileno(), QSocketNotifier.Read, self)
+        self.notifier.activated.connect(lambda fd: self.on_signal(signum))
+
+    def on_signal(self, signum):
+        try:
+            received = self.sockets[0].recv(64)
+        except OSError:
+            return
+        if signum in received:
+            try:
+                path = self.dump()
+                EVENT_LOG.info("diagnostics_dump", f"Diagnostics written to {path}", path=path)
+            except OSError as error:
+                EVENT_LOG.error("diagnostics_dump", f"Cannot write diagnostics: {error}", error=str(error))
+
+
+# The process-wide instrumentation; call sites check DIAGNOSTICS.enabled before measuring anything
+DIAGNOSTICS = Diagnostics()
@@ -0,0 +1,119 @@
+'''
+Coalesced window dragging.
+
+Mice with a high polling rate deliver 500-1000 move events per second, and
+moving the window for each of them floods the window manager with geometry
+requests. The DragController keeps only the latest position of a drag and
+moves the window at most once per display refresh: the first move after a
+pause is applied at once, later ones wait for the next refresh interval and
+replace each other while waiting. Releasing the button applies the final
+position immediately.
+
+The window can optionally snap to the edges of the screen's available area
+when it is dropped within snap_distance pixels of them.
+'''
+
+import time                                     # Import time module for the refresh interval
+from PyQt5.QtCore import Qt, QObject, QPoint, QTimer  # Import core modules (timer, geometry)
+from PyQt5.QtWidgets import QApplication         # Import the application class for the screen geometry
+
+
+# Refresh rate assumed when the screen does not report one
+DEFAULT_REFRESH_RATE = 60.0
+
+
+class DragController(QObject):
+    # snap_distance: distance in pixels from a screen edge within which a dropped window sticks to it (0 disables)
+    def __init__(self, window, snap_distance=0):
+        super().__init__(window)
+        self.window = window
+        self.snap_distance = snap_distance
+        self.offset = None            # Cursor position relative to the window's top-left corner while dragging
+        self.pending = None           # Latest window position not applied yet
+        self.last_move = 0.0          # Time of the last applied move in monotonic ms
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.flush)
+        # Counters
+        self.events = 0               # Mouse move events received while dragging
+        self.coalesced = 0            # Positions replaced by a later one before they were applied
+        self.applied = 0              # Window moves actually made
+        self.snapped = 0              # Drops that snapped to a screen edge
+
+    @staticmethod
+    def now():
+        return time.monotonic() * 1000
+
+    # Milliseconds between two refreshes of the screen the window is on
+    def refresh_interval(self):
+        handle = self.window.windowHandle()
+        screen = handle.screen() if handle is not None else QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen is not None else 0
+        return 1000.0 / (rate if rate > 0 else DEFAULT_REFRESH_RATE)
+
+    def dragging(self):
+        return self.offset is not None
+
+    def press(self, global_pos):
+        self.offset = global_pos - self.window.frameGeometry().topLeft()
+
+    # A mouse move while dragging: apply now if a refresh interval has passed, otherwise keep it for the next refresh
+    def move(self, global_pos):
+        if self.offset is None:
+            return
+        self.events += 1
+        if self.pending is not None:
+            self.coalesced += 1
+        self.pending = global_pos - self.offset
+        if self.timer.isActive():
+            return
+        wait = self.last_move + self.refresh_interval() - self.now()
+        if wait <= 0:
+            self.flush()
+        else:
+            self.timer.start(int(wait + 0.5))
+
+    # End of the drag: apply the final position at once, snapped to nearby screen edges
+    def release(self):
+        if self.offset is None:
+            return
+        self.timer.stop()
+        if self.pending is None:
+            self.pending = self.window.pos()
+        self.pending = self.snap(self.pending)
+        self.flush()
+        self.offset = None
+
+    def flush(self):
+        if self.pending is None:
+            return
+        position, self.pending = self.pending, None
+        if position != self.window.pos():
+            self.window.move(position)
+            self.applied += 1
+        self.last_move = self.now()
+
+    # Move a window position onto the edges of the available screen area it is within snap_distance of
+    def snap(self, position):
+        if self.snap_distance <= 0:
+            return position
+        area = QApplication.desktop().availableGeometry(self.window)
+        size = self.window.frameGeometry().size()
+        x, y = position.x(), position.y()
+        if abs(x - area.left()) <= self.snap_distance:
+            x = area.left()
+        elif abs(x + size.width() - 1 - area.right()) <= self.snap_distance:
+            x = area.right() - size.width() + 1
+        if abs(y - area.top()) <= self.snap_distance:
+            y = area.top()
+        elif abs(y + size.height() - 1 - area.bottom()) <= self.snap_distance:
+            y = area.bottom() - size.height() + 1
+        snapped = QPoint(x, y)
+        if snapped != position:
+            self.snapped += 1
+        return snapped
+
+    def stats(self):
+        return {"events": self.events, "coalesced": self.coalesced, "applied": self.applied, "snapped": self.snapped,
+                "reduction": 1 - self.applied / self.events if self.events else 0.0}
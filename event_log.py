@@ -0,0 +1,197 @@
+'''
+Non-blocking structured event log.
+
+Logging an event on the GUI thread only appends a small record (time, level,
+event name, message and fields such as the pet's state, mood and energy) to a
+bounded in-memory ring buffer. A background thread drains the buffer: it
+prints the message to the terminal as before, and can also append each record
+as a JSON line to a log file, rotated by size. A slow terminal, pipe or
+journald therefore never holds up input handling:
+
+- when the buffer is filled beyond HIGH_WATER, only one in SAMPLE_EVERY
+  records below WARNING is kept (sampling)
+- when it is full, the oldest record is dropped
+
+The counters of sampled and dropped records are in stats() and are reported
+in the log once the pressure is over.
+
+python desktop_puppy.py --log-file ~/.cache/desktop_puppy/events.jsonl --log-level debug
+'''
+
+import atexit                                   # Write what is left on exit
+import json                                     # Import json for the log file records
+import os                                       # Import the operating system module and process the file path
+import sys                                      # The terminal output
+import threading                                # The writer thread
+import time                                     # Import time module for the record timestamps
+from collections import deque                   # The ring buffer
+
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVEL_NAMES = {DEBUG: "debug", INFO: "info", WARNING: "warning", ERROR: "error"}
+
+# Records held in memory for the writer at most
+BUFFER_SIZE = 1024
+
+# Above this fill level (a fraction of the buffer), only one in SAMPLE_EVERY records below WARNING is kept
+HIGH_WATER = 0.75
+SAMPLE_EVERY = 10
+
+# The log file is rotated at this size, keeping this many old files (events.jsonl.1, .2, ...)
+MAX_BYTES = 1024 * 1024
+BACKUP_COUNT = 3
+
+# Seconds to wait for the writer on exit
+CLOSE_TIMEOUT = 1.0
+
+
+def parse_level(name):
+    for level, level_name in LEVEL_NAMES.items():
+        if level_name == name.lower():
+            return level
+    raise ValueError(f"Unknown log level: {name}")
+
+
+class EventLog:
+    def __init__(self, level=INFO, console=True, path=None, buffer_size=BUFFER_SIZE, max_bytes=MAX_BYTES,
+                 backup_count=BACKUP_COUNT):
+        self.level = level
+        self.console = console        # Print messages to the terminal
+        self.path = path              # JSON-lines log file, if any
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffer = deque(maxlen=buffer_size)
+        self.high_water = int(buffer_size * HIGH_WATER)
+        self.wakeup = threading.Event()
+        self.writer = None            # Started with the first record
+        self.file = None
+        self.closing = False
+        # Counters
+        self.logged = 0               # Records at or above the level, kept or not
+        self.pressure_records = 0     # Records below WARNING that arrived above the high-water mark (sampling cadence)
+        self.written = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.write_errors = 0
+        self.reported_loss = 0        # Sampled and dropped records already reported in the log
+
+    def configure(self, level=None, console=None, path=None):
+        if level is not None:
+            self.level = level
+        if console is not None:
+            self.console = console
+        if path is not None:
+            self.path = os.path.expanduser(path)
+
+    # Queue a record (never blocks); fields are stored with it, e.g. state, mood and energy
+    def log(self, level, event, message="", **fields):
+        if level < self.level or self.closing:
+            return
+        self.logged += 1
+        filled = len(self.buffer)
+        if filled >= self.high_water and level < WARNING:
+            self.pressure_records += 1
+            if self.pressure_records % SAMPLE_EVERY:
+                self.sampled_out += 1
+                return
+        if filled == self.buffer.maxlen:
+            self.dropped += 1     # The deque drops the oldest record
+        record = {"time": time.time(), "level": level, "event": event, "message": message}
+        record.update(fields)
+        self.buffer.append(record)
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, name="event-log", daemon=True)
+            self.writer.start()
+        self.wakeup.set()
+
+    def debug(self, event, message="", **fields):
+        self.log(DEBUG, event, message, **fields)
+
+    def info(self, event, message="", **fields):
+        self.log(INFO, event, message, **fields)
+
+    def warning(self, event, message="", **fields):
+        self.log(WARNING, event, message, **fields)
+
+    def error(self, event, message="", **fields):
+        self.log(ERROR, event, message, **fields)
+
+    # Writer thread: drain the buffer whenever woken up
+    def write_loop(self):
+        while True:
+            self.wakeup.wait()
+            self.wakeup.clear()
+            while self.buffer:
+                self.write(self.buffer.popleft())
+            self.report_loss()
+            if self.closing and not self.buffer:
+                break
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, record):
+        try:
+            if self.console and record["message"]:
+                stream = sys.stdout if record["level"] < WARNING else sys.stderr
+                stream.write(record["message"] + "\n")
+                stream.flush()
+            if self.path:
+                record = dict(record, level=LEVEL_NAMES.get(record["level"], record["level"]))
+                self.write_file(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self.written += 1
+        except (OSError, ValueError):
+            self.write_errors += 1  # A closed or broken terminal must not stop the writer
+
+    def write_file(self, line):
+        if self.file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(line)
+        self.file.flush()
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    # events.jsonl -> events.jsonl.1 -> ... -> events.jsonl.<backup_count> (the oldest is deleted)
+    def rotate(self):
+        self.file.close()
+        self.file = None
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    # Once the buffer has drained, note how many records were lost to sampling or dropping since the last note
+    def report_loss(self):
+        lost = self.sampled_out + self.dropped
+        if lost > self.reported_loss:
+            self.write({"time": time.time(), "level": WARNING, "event": "log_pressure",
+                        "message": f"Event log under pressure: {self.sampled_out} records sampled out, "
+                                   f"{self.dropped} dropped so far",
+                        "sampled_out": self.sampled_out, "dropped": self.dropped})
+            self.reported_loss = lost
+
+    # Write what is queued (waiting at most timeout seconds) and stop the writer
+    def close(self, timeout=CLOSE_TIMEOUT):
+        if self.closing:
+            return
+        self.closing = True
+        if self.writer is not None:
+            self.wakeup.set()
+            self.writer.join(timeout)
+
+    def stats(self):
+        return {"queued": len(self.buffer), "logged": self.logged, "written": self.written,
+                "sampled_out": self.sampled_out, "dropped": self.dropped, "rotations": self.rotations,
+                "write_errors": self.write_errors}
+
+
+# The process-wide event log
+EVENT_LOG = EventLog()
+atexit.register(EVENT_LOG.close)
@@ -0,0 +1,525 @@
+'''
+Shared cache of pre-decoded animation frames.
+
+Every GIF in assets/ is decoded once into a list of QImage frames plus the
+per-frame delays, and kept in memory under a byte budget. Switching back to a
+state that was already shown then costs no disk I/O and no decode work.
+Least-recently-used animations are evicted when the budget is exceeded.
+
+Frames can also be requested at a target size: they are then scaled once to
+the window's device-pixel size, so nothing has to be rescaled on paint. The
+scaled frames can optionally be stored in an on-disk derived-asset cache,
+which is invalidated when the source file changes.
+'''
+
+import os                                       # Import the operating system module for paths and environment variables
+import struct                                   # Pack and unpack the header of derived-asset files
+import hashlib                                  # Hash asset paths into derived-asset file names
+import time                                     # Import time module for measuring paused time
+from collections import OrderedDict             # Ordered dictionary used as the LRU list
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal  # Import core modules (timer, signals)
+from PyQt5.QtGui import QImage, QImageReader     # Import image decoding classes
+import sprite_sheet                              # Memory-mapped sprite sheets converted from the GIFs
+from diagnostics import DIAGNOSTICS              # Decode-time histogram (when enabled)
+
+
+# Default memory budget of the cache in bytes (can be overridden with the PUPPY_FRAME_CACHE_MB environment variable)
+DEFAULT_BUDGET_BYTES = int(os.environ.get("PUPPY_FRAME_CACHE_MB", "128")) * 1024 * 1024
+
+# Delay used for frames that do not declare one (the same fallback QMovie uses)
+DEFAULT_FRAME_DELAY = 100
+
+
+# Default directory of the on-disk derived-asset cache
+DEFAULT_DISK_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")), "desktop_puppy")
+
+
+# A decoded animation: all frames of one asset and the delay of every frame in milliseconds
+class DecodedAnimation:
+    def __init__(self, path, frames, delays):
+        self.path = path
+        self.frames = frames      # List of QImage frames (premultiplied ARGB, fast to draw)
+        self.delays = delays      # List of frame delays in milliseconds
+        self.nbytes = sum(frame.sizeInBytes() for frame in frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+
+# Decode every frame of an image file (GIF or single image) into memory
+# Sprite sheets are memory-mapped instead of decoded; an invalid or stale sheet falls back to its source asset
+def decode_animation(path):
+    if sprite_sheet.is_sprite_sheet(path):
+        sheet = sprite_sheet.read_sprite_sheet(path)
+        if sheet is not None:
+            frames, delays, source = sheet
+            return DecodedAnimation(path, frames, delays)
+        source = sprite_sheet.guess_source(path)
+        return decode_animation(source) if source else None
+    reader = QImageReader(path)
+    frames = []
+    delays = []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        frames.append(image.convertToFormat(QImage.Format_ARGB32_Premultiplied))
+        delay = reader.nextImageDelay()
+        delays.append(delay if delay > 0 else DEFAULT_FRAME_DELAY)
+        if not reader.canRead():
+            break
+    if not frames:
+        return None  # Loading failed (missing or corrupt file)
+    return DecodedAnimation(path, frames, delays)
+
+
+# Decode only the first frame of an image file (enough to put something on screen at startup)
+def decode_first_frame(path):
+    image = QImageReader(path).read()
+    if image.isNull():
+        return None
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+
+# Scale every frame of an animation once to a fixed pixel size (the original images are 720×720)
+def scale_animation(animation, width, height, device_pixel_ratio=1.0):
+    frames = []
+    for frame in animation.frames:
+        scaled = frame.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        scaled.setDevicePixelRatio(device_pixel_ratio)  # Displayed at the logical window size on high-DPI screens
+        frames.append(scaled)
+    return DecodedAnimation(animation.path, frames, list(animation.delays))
+
+
+# On-disk cache of scaled frames, one raw file per (asset, size) pair
+# A file is only used while the source asset has the same mtime and file size it had when the file was written
+class DerivedAssetCache:
+    MAGIC = b"DPFC"
+    VERSION = 1
+    HEADER = struct.Struct("<4sIqqIIdI")  # magic, version, source mtime_ns, source size, width, height, dpr, frame count
+
+    def __init__(self, directory=DEFAULT_DISK_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def file_for(self, path, width, height, device_pixel_ratio):
+        key = f"{os.path.abspath(path)}|{width}x{height}@{device_pixel_ratio}".encode("utf-8")
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest() + ".frames")
+
+    # Return the cached scaled animation, or None if it is missing or stale
+    def load(self, path, width, height, device_pixel_ratio):
+        try:
+            source = os.stat(path)
+            with open(self.file_for(path, width, height, device_pixel_ratio), "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        animation = self.parse(data, path, source, width, height, device_pixel_ratio)
+        if animation is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return animation
+
+    def parse(self, data, path, source, width, height, device_pixel_ratio):
+        if len(data) < self.HEADER.size:
+            return None
+        magic, version, mtime_ns, size, w, h, dpr, count = self.HEADER.unpack_from(data)
+        if (magic != self.MAGIC or version != self.VERSION or mtime_ns != source.st_mtime_ns
+                or size != source.st_size or (w, h, dpr) != (width, height, device_pixel_ratio)):
+            return None  # Stale or foreign file: the source asset changed since it was written
+        offset = self.HEADER.size
+        frame_bytes = w * h * 4
+        if len(data) != offset + 4 * count + frame_bytes * count:
+            return None  # Truncated file
+        delays = list(struct.unpack_from(f"<{count}I", data, offset))
+        offset += 4 * count
+        frames = []
+        for _ in range(count):
+            frame = QImage(data[offset:offset + frame_bytes], w, h, w * 4, QImage.Format_ARGB32_Premultiplied).copy()
+            frame.setDevicePixelRatio(dpr)
+            frames.append(frame)
+            offset += frame_bytes
+        return DecodedAnimation(path, frames, delays)
+
+    # Write a scaled animation to disk (atomically, so a crash never leaves a half-written file behind)
+    def store(self, path, animation, width, height, device_pixel_ratio):
+        try:
+            source = os.stat(path)
+            os.makedirs(self.directory, exist_ok=True)
+            target = self.file_for(path, width, height, device_pixel_ratio)
+            tmp = target + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, source.st_mtime_ns, source.st_size,
+                                         width, height, device_pixel_ratio, len(animation)))
+                f.write(struct.pack(f"<{len(animation)}I", *animation.delays))
+                for frame in animation.frames:
+                    ptr = frame.constBits()
+                    ptr.setsize(frame.sizeInBytes())
+                    f.write(bytes(ptr))
+            os.replace(tmp, target)
+        except OSError:
+            pass  # The disk cache is only an optimisation, so failing to write it is not an error
+
+
+# LRU cache of decoded animations keyed by asset path and target size, bounded by a byte budget
+class FrameCache:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, loader=decode_animation, disk_cache=None):
+        self.budget_bytes = budget_bytes
+        self.loader = loader              # Function path -> DecodedAnimation (or None on failure)
+        self.disk_cache = disk_cache      # Optional DerivedAssetCache for scaled frames
+        self.entries = OrderedDict()      # (path, size, dpr) -> DecodedAnimation, most recently used last
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Entries are keyed by the asset path plus the target pixel size (None for the original size)
+    @staticmethod
+    def key(path, size=None, device_pixel_ratio=1.0):
+        return (path, size, device_pixel_ratio)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Return the decoded animation for a path, decoding and caching it on a miss
+    # size is an optional (width, height) in device pixels; frames are then scaled once and cached scaled
+    def get(self, path, size=None, device_pixel_ratio=1.0):
+        key = self.key(path, size, device_pixel_ratio)
+        animation = self.entries.get(key)
+        if animation is not None:
+            self.entries.move_to_end(key)  # Mark as most recently used
+            self.hits += 1
+            return animation
+        self.misses += 1
+        animation = self.load(path, size, device_pixel_ratio)
+        if animation is not None:
+            self.put(key, animation)
+        return animation
+
+    # Decode (and scale) an asset, going through the disk cache for scaled frames, and record the decode time
+    # Used on the GUI thread; the prefetch worker calls decode() and its time is recorded when the result arrives
+    def load(self, path, size=None, device_pixel_ratio=1.0):
+        if not DIAGNOSTICS.enabled:
+            return self.decode(path, size, device_pixel_ratio)
+        started = time.perf_counter()
+        animation = self.decode(path, size, device_pixel_ratio)
+        DIAGNOSTICS.record("decode_ms", (time.perf_counter() - started) * 1000)
+        return animation
+
+    def decode(self, path, size=None, device_pixel_ratio=1.0):
+        if size is None:
+            return self.loader(path)
+        width, height = size
+        if self.disk_cache is not None:
+            animation = self.disk_cache.load(path, width, height, device_pixel_ratio)
+            if animation is not None:
+                return animation
+        animation = self.loader(path)
+        if animation is None:
+            return None
+        if animation.frames[0].width() == width and animation.frames[0].height() == height:
+            # Already the right size (a sprite sheet converted for this size): use the frames as they are
+            if device_pixel_ratio != 1.0:
+                for frame in animation.frames:
+                    frame.setDevicePixelRatio(device_pixel_ratio)
+            return animation
+        animation = scale_animation(animation, width, height, device_pixel_ratio)
+        if self.disk_cache is not None:
+            self.disk_cache.store(path, animation, width, height, device_pixel_ratio)
+        return animation
+
+    # Return the first frame of an asset as cheaply as possible: from memory, from the disk cache, or by decoding one frame only
+    def first_frame(self, path, size=None, device_pixel_ratio=1.0):
+        key = self.key(path, size, device_pixel_ratio)
+        animation = self.entries.get(key)
+        if animation is not None:
+            return animation.frames[0]
+        if sprite_sheet.is_sprite_sheet(path):
+            animation = self.get(path, size, device_pixel_ratio)  # Mapping a whole sheet costs no more than one frame
+            return animation.frames[0] if animation is not None else None
+        if size is not None and self.disk_cache is not None:
+            animation = self.disk_cache.load(path, size[0], size[1], device_pixel_ratio)
+            if animation is not None:
+                self.put(key, animation)  # The whole animation came for free, keep it
+                return animation.frames[0]
+        frame = decode_first_frame(path)
+        if frame is None or size is None:
+            return frame
+        frame = frame.scaled(size[0], size[1], Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        frame.setDevicePixelRatio(device_pixel_ratio)
+        return frame
+
+    # Insert an already decoded animation and evict old entries until the budget fits
+    def put(self, key, animation):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old.nbytes
+        self.entries[key] = animation
+        self.total_bytes += animation.nbytes
+        self.evict(keep=key)
+
+    # Evict least-recently-used entries while over budget (never the entry that was just inserted)
+    def evict(self, keep=None):
+        while self.total_bytes > self.budget_bytes and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            if key == keep:
+                break
+            old = self.entries.pop(key)
+            self.total_bytes -= old.nbytes
+            self.evictions += 1
+
+    # Change the byte budget at runtime
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict()
+
+    # Decode a list of assets ahead of time so the first switch to them is already a hit
+    def preload(self, paths, size=None, device_pixel_ratio=1.0):
+        for path in paths:
+            key = self.key(path, size, device_pixel_ratio)
+            if key not in self.entries:
+                animation = self.load(path, size, device_pixel_ratio)
+                if animation is not None:
+                    self.put(key, animation)
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    # Hit/miss counters and memory usage, e.g. for debugging output
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "budget_bytes": self.budget_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_hits": self.disk_cache.hits if self.disk_cache else 0,
+            "disk_misses": self.disk_cache.misses if self.disk_cache else 0,
+        }
+
+
+# The process-wide cache shared by all pets
+# The disk cache of scaled frames is enabled with PUPPY_DISK_CACHE=1 (or a directory path)
+_shared_cache = None
+
+
+def shared_frame_cache():
+    global _shared_cache
+    if _shared_cache is None:
+        disk_setting = os.environ.get("PUPPY_DISK_CACHE", "")
+        disk_cache = None
+        if disk_setting and disk_setting != "0":
+            disk_cache = DerivedAssetCache(DEFAULT_DISK_CACHE_DIR if disk_setting == "1" else disk_setting)
+        _shared_cache = FrameCache(disk_cache=disk_cache)
+        DIAGNOSTICS.add_source("frame_cache", _shared_cache.stats)  # Hit/miss counters in the report and dump
+    return _shared_cache
+
+
+# Frame clock shared by several players: one timer is armed for the earliest frame due among all players,
+# and every player due within BATCH_SLACK ms of it advances in the same wakeup
+BATCH_SLACK = 8
+
+
+class FrameClock(QObject):
+    def __init__(self, parent=None, slack=BATCH_SLACK):
+        super().__init__(parent)
+        self.slack = slack
+        self.due = {}                 # ClockTimer -> deadline in monotonic ms
+        self.armed_at = None          # Deadline the QTimer is currently armed for
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.tick)
+        self.wakeups = 0              # Timer wakeups of the clock
+        self.fired = 0                # Player timeouts delivered (frames advanced)
+
+    @staticmethod
+    def now():
+        return time.monotonic() * 1000
+
+    # A timer object with the QTimer methods FramePlayer uses, backed by this clock
+    def timer_for(self, callback):
+        return ClockTimer(self, callback)
+
+    def schedule(self, entry, delay):
+        deadline = self.now() + delay
+        self.due[entry] = deadline
+        if self.armed_at is None or deadline < self.armed_at:
+            self.arm()
+
+    def cancel(self, entry):
+        self.due.pop(entry, None)  # A wakeup that finds nothing due just re-arms
+
+    def arm(self):
+        if not self.due:
+            self.timer.stop()
+            self.armed_at = None
+            return
+        self.armed_at = min(self.due.values())
+        self.timer.start(max(0, int(self.armed_at - self.now())))
+
+    def tick(self):
+        self.wakeups += 1
+        limit = self.now() + self.slack
+        ready = [entry for entry, deadline in self.due.items() if deadline <= limit]
+        for entry in ready:
+            del self.due[entry]
+        self.armed_at = None
+        for entry in ready:
+            self.fired += 1
+            entry.callback()
+        self.arm()
+
+    def stats(self):
+        return {"players_waiting": len(self.due), "wakeups": self.wakeups, "frames": self.fired}
+
+
+class ClockTimer:
+    def __init__(self, clock, callback):
+        self.clock = clock
+        self.callback = callback
+
+    def start(self, delay):
+        self.clock.schedule(self, delay)
+
+    def stop(self):
+        self.clock.cancel(self)
+
+    def isActive(self):
+        return self in self.clock.due
+
+
+# The process-wide frame clock shared by all pets in multi-pet mode
+_shared_clock = None
+
+
+def shared_frame_clock():
+    global _shared_clock
+    if _shared_clock is None:
+        _shared_clock = FrameClock()
+    return _shared_clock
+
+
+# Plays a DecodedAnimation with a single-shot timer, replacing QMovie for cached frames
+# The player can be paused and given a frame-rate cap; capped playback keeps the animation's real-time pace
+# by skipping frames instead of waking up for every one of them
+class FramePlayer(QObject):
+    frameChanged = pyqtSignal(int)  # Emitted with the new frame number
+
+    # With a FrameClock, the player's frames are timed by the shared clock instead of a timer of its own
+    def __init__(self, parent=None, clock=None):
+        super().__init__(parent)
+        self.animation = None
+        self.frame_number = 0
+        self.speed = 100              # Playback speed in percent, like QMovie.setSpeed
+        self.running = False
+        self.paused = False
+        self.min_interval = 0         # Minimum time between two shown frames in ms (0 = no frame-rate cap)
+        self.step = 1                 # Number of frames the next timeout advances (more than 1 when frames are skipped)
+        self.paused_at = None         # Monotonic time of the last pause, used to count the frames missed while paused
+        self.frames_rendered = 0      # Frames actually handed to the window
+        self.frames_skipped = 0       # Frames that would have been shown at full rate but were skipped or paused away
+        if clock is not None:
+            self.timer = clock.timer_for(self.advance)
+        else:
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.setTimerType(Qt.CoarseTimer)  # Let the OS batch our wakeups with others
+            self.timer.timeout.connect(self.advance)
+
+    # Switch to a new animation and restart it from the first frame
+    def set_animation(self, animation):
+        self.timer.stop()
+        self.animation = animation
+        self.frame_number = 0
+        if self.running and not self.paused:
+            self.emit_frame()
+            self.schedule_next()
+
+    def current_image(self):
+        if self.animation is None:
+            return None
+        return self.animation.frames[self.frame_number]
+
+    def start(self):
+        self.running = True
+        if self.animation is not None and not self.paused:
+            self.emit_frame()
+            self.schedule_next()
+
+    def stop(self):
+        self.running = False
+        self.timer.stop()
+
+    def setSpeed(self, percent):
+        self.speed = max(1, percent)
+
+    # Stop waking up for frames until resume() (the current frame stays on screen)
+    def pause(self):
+        if self.paused:
+            return
+        self.paused = True
+        self.paused_at = time.monotonic()
+        self.timer.stop()
+
+    # Continue immediately with a fresh frame
+    def resume(self):
+        if not self.paused:
+            return
+        self.paused = False
+        if self.animation is not None and self.paused_at is not None:
+            missed_ms = (time.monotonic() - self.paused_at) * 1000
+            self.frames_skipped += int(missed_ms * len(self.animation) * self.speed / 100 / sum(self.animation.delays))
+        self.paused_at = None
+        if self.running and self.animation is not None:
+            self.emit_frame()
+            self.schedule_next()
+
+    # Limit the number of shown frames per second (None or 0 removes the limit)
+    def set_max_fps(self, fps):
+        min_interval = int(1000 / fps) if fps else 0
+        if min_interval == self.min_interval:
+            return
+        self.min_interval = min_interval
+        if self.running and not self.paused and self.timer.isActive():
+            self.schedule_next()
+
+    def frame_delay(self, frame_number):
+        return max(1, self.animation.delays[frame_number] * 100 // self.speed)
+
+    def schedule_next(self):
+        if self.animation is None or len(self.animation) < 2:
+            return  # Still images never need a timer
+        count = len(self.animation)
+        delay = self.frame_delay(self.frame_number)
+        step = 1
+        # Under a frame-rate cap, fold the following frames into this wait until the interval is long enough
+        while delay < self.min_interval and step < count:
+            delay += self.frame_delay((self.frame_number + step) % count)
+            step += 1
+        self.step = step
+        self.timer.start(delay)
+
+    # Show the next frame (looping forever, like the GIFs in assets/)
+    def advance(self):
+        if not self.running or self.paused or self.animation is None:
+            return
+        self.frames_skipped += self.step - 1
+        self.frame_number = (self.frame_number + self.step) % len(self.animation)
+        self.emit_frame()
+        self.schedule_next()
+
+    def emit_frame(self):
+        self.frames_rendered += 1
+        self.frameChanged.emit(self.frame_number)
@@ -0,0 +1,210 @@
+'''
+Record the input a pet receives and replay it offscreen on a virtual clock.
+
+Recording (python desktop_puppy.py --record trace.jsonl.gz) writes one JSON
+line per input: states chosen from the menu, schedule changes, resets, speech
+bubbles, double-clicks and the presses, moves and releases of drags, each with
+its time in milliseconds since the start. The first line holds what replay
+needs to start from the same place: the pet's state, its position and size,
+and the seed of its random petting thresholds. Paths ending in .gz are
+compressed. The file is flushed every FLUSH_EVERY inputs and every
+FLUSH_INTERVAL seconds, so a pet that is killed loses only its last few inputs;
+such a trace (a cut-off last line, no gzip end marker) still replays.
+
+Replay feeds the trace back into a DesktopPet under Qt's offscreen platform.
+The pet's PetEngine reads a virtual clock that jumps to the time of each
+input, so the petting cooldown, the double-click count reset and the sleep
+recovery behave as they did, but a day of usage replays in seconds. It can run
+under cProfile and prints a JSON summary:
+
+python input_trace.py trace.jsonl.gz
+python input_trace.py trace.jsonl.gz --speed 60            # one recorded minute per second
+python input_trace.py trace.jsonl.gz --profile replay.prof
+'''
+
+import argparse                                 # Import the command line argument parser
+import gzip                                     # Compressed trace files
+import json                                     # Import json for the trace lines and the summary
+import os                                       # Import the operating system module and process the file path
+import random                                   # Seeds for the petting thresholds
+import sys                                      # Import system modules
+import time                                     # Import time module for the timestamps
+
+
+TRACE_VERSION = 1
+
+# The trace is flushed (for .gz, a zlib sync flush) after this many inputs, and this many seconds after an input at most
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 5
+
+
+def open_trace(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+# Writes the inputs of one pet to a trace file
+class TraceRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open_trace(path, "w")
+        self.started = None
+        self.events = 0
+        self.unflushed = 0
+        self.flush_timer = None       # Created by start(), with the pet as parent
+
+    # Write the header; reseeds the pet's petting thresholds so replay draws the same ones
+    def start(self, pet):
+        from PyQt5.QtCore import Qt, QTimer
+        self.flush_timer = QTimer(pet)
+        self.flush_timer.setTimerType(Qt.VeryCoarseTimer)
+        self.flush_timer.setInterval(FLUSH_INTERVAL * 1000)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start()
+        seed = random.randrange(2 ** 32)
+        pet.engine.rng.seed(seed)
+        pet.engine.double_click_threshold = pet.engine.new_threshold()
+        self.started = time.time()
+        header = {"version": TRACE_VERSION, "start": self.started, "seed": seed, "status": pet.status,
+                  "state": pet.engine.state(), "window_size": pet.window_size, "position": [pet.x(), pet.y()]}
+        self.file.write(json.dumps(header) + "\n")
+        self.file.flush()
+
+    def record(self, kind, *args):
+        if self.file is None:
+            return
+        line = [round((time.time() - self.started) * 1000), kind, *args]
+        self.file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        self.events += 1
+        self.unflushed += 1
+        if self.unflushed >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if self.file is not None and self.unflushed:
+            self.file.flush()
+            self.unflushed = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+# Return the header and the list of [ms, kind, *args] events of a trace
+# A trace whose recorder was killed ends in a cut-off line (and, compressed, without the gzip end marker): both are skipped
+def read_trace(path):
+    lines = []
+    with open_trace(path, "r") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError(f"{path}: unsupported trace version {header.get('version')}")
+        try:
+            for line in f:
+                lines.append(line)
+        except EOFError:
+            pass
+    if lines and not lines[-1].endswith("\n"):
+        lines.pop()
+    events = [json.loads(line) for line in lines if line.strip()]
+    return header, events
+
+
+# Time source for the PetEngine during replay: only moves when the replay moves it
+class VirtualClock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+# Feed the trace into an offscreen DesktopPet; speed 0 replays as fast as possible, otherwise N recorded seconds per second
+def replay(path, speed=0.0):
+    from PyQt5.QtCore import Qt, QPoint, QEvent
+    from PyQt5.QtGui import QMouseEvent
+    from PyQt5.QtWidgets import QApplication
+    from desktop_puppy import DesktopPet
+
+    header, events = read_trace(path)
+    app = QApplication.instance()
+    clock = VirtualClock(header["start"])
+    pet = DesktopPet(window_size=header["window_size"], idle_timeout=0, position=tuple(header["position"]),
+                     status=header["status"])
+    pet.engine.clock = clock.time
+    pet.engine.restore(header["state"])
+    pet.engine.rng.seed(header["seed"])
+    pet.engine.double_click_threshold = pet.engine.new_threshold()
+    pet.finish_startup()
+    pet.schedule_timer.statusChanged.disconnect(pet.on_schedule_changed)  # Schedule changes come from the trace
+
+    def mouse(kind, global_pos, button, buttons):
+        return QMouseEvent(kind, global_pos - pet.pos(), global_pos, button, buttons, Qt.NoModifier)
+
+    actions = {
+        "status": pet.set_status,
+        "schedule": pet.on_schedule_changed,
+        "reset": pet.apply_reset,
+        "bubble": pet.show_bubble,
+        "clear_bubble": pet.clear_bubble,
+        "double_click": lambda x, y: pet.mouseDoubleClickEvent(
+            mouse(QEvent.MouseButtonDblClick, pet.pos() + QPoint(x, y), Qt.LeftButton, Qt.LeftButton)),
+        "press": lambda x, y: pet.mousePressEvent(mouse(QEvent.MouseButtonPress, QPoint(x, y), Qt.LeftButton, Qt.LeftButton)),
+        "move": lambda x, y: pet.mouseMoveEvent(mouse(QEvent.MouseMove, QPoint(x, y), Qt.NoButton, Qt.LeftButton)),
+        "release": lambda x, y: pet.mouseReleaseEvent(mouse(QEvent.MouseButtonRelease, QPoint(x, y), Qt.LeftButton, Qt.NoButton)),
+    }
+    counts = {}
+    started = time.perf_counter()
+    for ms, kind, *args in events:
+        clock.now = header["start"] + ms / 1000
+        if speed > 0:
+            while time.perf_counter() - started < ms / 1000 / speed:
+                app.processEvents()
+        actions[kind](*args)
+        counts[kind] = counts.get(kind, 0) + 1
+        app.processEvents()
+    wall = time.perf_counter() - started
+    recorded = events[-1][0] / 1000 if events else 0.0
+    summary = {
+        "events": len(events),
+        "inputs": counts,
+        "recorded_seconds": recorded,
+        "replay_seconds": wall,
+        "speedup": recorded / wall if wall else 0.0,
+        "status": pet.status,
+        "state": pet.engine.state(),
+        "position": [pet.x(), pet.y()],
+        "overlays": pet.overlays.stats(),
+        "drag": pet.drag.stats(),
+    }
+    pet.prefetcher.shutdown()  # Replay runs no event loop, so aboutToQuit never joins the decode pool
+    pet.close()
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded input trace offscreen")
+    parser.add_argument("trace", help="trace file written with desktop_puppy.py --record")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="recorded seconds per real second (default: 0, as fast as possible)")
+    parser.add_argument("--profile", metavar="PATH", help="run under cProfile and write the statistics to PATH")
+    parser.add_argument("--verbose", action="store_true", help="show the pet's terminal output")
+    args = parser.parse_args()
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication(sys.argv[:1])
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    from event_log import EVENT_LOG
+    EVENT_LOG.configure(console=args.verbose)  # The pet's terminal output
+    summary = replay(args.trace, args.speed)
+    EVENT_LOG.close()
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        summary["profile"] = args.profile
+    print(json.dumps(summary, indent=2))
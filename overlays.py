@@ -0,0 +1,153 @@
+'''
+Overlays for the pet window: the heart animation, state tips, warnings and the speech bubble.
+
+Overlays are drawn by the window's PetCanvas (see compositor.py), not as child
+widgets. The heart picture is loaded and scaled once per size, tip and bubble
+texts are rendered to an image once per message and reused, and showing a tip
+with the same text as one that is still on screen only extends that tip
+instead of stacking another one.
+'''
+
+import os                                       # Import the operating system module and process the file path
+from collections import OrderedDict             # Ordered dictionary used as the LRU list of rendered texts
+from PyQt5.QtCore import Qt, QRect               # Import core modules (geometry)
+from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QFont, QFontMetrics, QPen  # Import painting classes
+from compositor import OverlayItem               # Import the compositor's overlay item
+
+
+HEART_PATH = os.path.join(os.path.dirname(__file__), "assets", "heart.png")
+TIP_DURATION = 2.0       # Tips and warnings disappear after 2 seconds
+HEART_DURATION = 3.0     # The heart fades out in 3 seconds
+TEXT_CACHE_SIZE = 16     # Rendered texts kept for reuse
+
+# Heart pixmaps scaled once per (size, device pixel ratio), shared by all pets
+_heart_pixmaps = {}
+
+
+# Return the heart picture scaled to size×size logical pixels (loaded from disk only the first time)
+def heart_pixmap(size, device_pixel_ratio=1.0):
+    key = (size, device_pixel_ratio)
+    pixmap = _heart_pixmaps.get(key)
+    if pixmap is None:
+        pixel_size = round(size * device_pixel_ratio)
+        pixmap = QPixmap(HEART_PATH).scaled(pixel_size, pixel_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        pixmap.setDevicePixelRatio(device_pixel_ratio)
+        _heart_pixmaps[key] = pixmap
+    return pixmap
+
+
+# Render wrapped text on a background (the looks the tip and bubble labels used to have) into an image
+# tip: black 16px text on translucent white; bubble: text on white with a gray border and 4px padding
+def render_text(text, max_width, style, device_pixel_ratio=1.0):
+    font = QFont()
+    if style == "tip":
+        font.setPixelSize(16)
+    padding = 4 if style == "bubble" else 0
+    metrics = QFontMetrics(font)
+    text_rect = metrics.boundingRect(QRect(0, 0, max_width - 2 * padding, 10000), Qt.TextWordWrap, text)
+    width = min(max_width, text_rect.width() + 2 * padding + 2)
+    height = text_rect.height() + 2 * padding + 2
+    image = QImage(round(width * device_pixel_ratio), round(height * device_pixel_ratio), QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(device_pixel_ratio)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setFont(font)
+    if style == "bubble":
+        painter.fillRect(QRect(0, 0, width, height), Qt.white)
+        painter.setPen(QPen(Qt.gray))
+        painter.drawRect(QRect(0, 0, width - 1, height - 1))
+    else:
+        painter.fillRect(QRect(0, 0, width, height), QColor(255, 255, 255, 178))
+    painter.setPen(Qt.black)
+    painter.drawText(QRect(padding + 1, padding + 1, width - 2 * padding - 2, height - 2 * padding - 2),
+                     Qt.TextWordWrap, text)
+    painter.end()
+    return image, width, height
+
+
+class OverlayManager:
+    def __init__(self, window, heart_size=60):
+        self.window = window          # The DesktopPet; overlays are drawn by window.canvas
+        self.heart_size = heart_size
+        self.active_tips = {}         # message -> OverlayItem currently on screen
+        self.rendered = OrderedDict() # (text, style, width, dpr) -> (image, width, height)
+        self.bubble = None            # The speech bubble item, if any
+        # Counters to see how much rendering the caches save
+        self.created = 0
+        self.reused = 0
+        self.coalesced = 0
+
+    @property
+    def canvas(self):
+        return self.window.canvas
+
+    def text_image(self, text, style, max_width):
+        dpr = self.window.devicePixelRatioF()
+        key = (text, style, max_width, dpr)
+        entry = self.rendered.get(key)
+        if entry is not None:
+            self.rendered.move_to_end(key)
+            self.reused += 1
+            return entry
+        entry = render_text(text, max_width, style, dpr)
+        self.created += 1
+        self.rendered[key] = entry
+        if len(self.rendered) > TEXT_CACHE_SIZE:
+            self.rendered.popitem(last=False)
+        return entry
+
+    # Show a tip or warning in the middle of the pet for 2 seconds
+    def show_tip(self, message):
+        tip = self.active_tips.get(message)
+        if tip is not None and tip in self.canvas.items:
+            self.coalesced += 1
+            self.canvas.restart_item(tip, TIP_DURATION)  # Same text already on screen: just keep it there longer
+            return tip
+        frame = self.canvas.frame_rect
+        image, width, height = self.text_image(message, "tip", frame.width())
+        rect = QRect(frame.x() + (frame.width() - width) // 2, frame.y() + (frame.height() - height) // 2, width, height)
+        tip = self.canvas.add_item(OverlayItem(image, rect, TIP_DURATION))
+        self.active_tips[message] = tip
+        return tip
+
+    # Show the heart in the middle of the pet and fade it out
+    def show_heart(self):
+        pixmap = heart_pixmap(self.heart_size, self.window.devicePixelRatioF())
+        # Use the true logical width and height of the pixmap to center
+        width = round(pixmap.width() / pixmap.devicePixelRatio())
+        height = round(pixmap.height() / pixmap.devicePixelRatio())
+        frame = self.canvas.frame_rect
+        rect = QRect(frame.x() + (frame.width() - width) // 2, frame.y() + (frame.height() - height) // 2, width, height)
+        return self.canvas.add_item(OverlayItem(pixmap, rect, HEART_DURATION, fade=True))
+
+    # Render the speech bubble; the window places it with place_bubble()
+    def set_bubble(self, text):
+        self.clear_bubble()
+        image, width, height = self.text_image(text, "bubble", self.canvas.frame_rect.width())
+        self.bubble = OverlayItem(image, QRect(0, 0, width, height))
+        return self.bubble
+
+    def place_bubble(self, top):
+        frame = self.canvas.frame_rect
+        rect = QRect(frame.x() + (frame.width() - self.bubble.rect.width()) // 2, top,
+                     self.bubble.rect.width(), self.bubble.rect.height())
+        if self.bubble in self.canvas.items:
+            self.canvas.move_item(self.bubble, rect)
+        else:
+            self.bubble.rect = rect
+            self.canvas.add_item(self.bubble)
+
+    def clear_bubble(self):
+        if self.bubble is not None:
+            self.canvas.remove_item(self.bubble)
+            self.bubble = None
+
+    # Move the overlays along when the frame moves inside the canvas (the bubble flips above or below the pet)
+    def shift(self, dy):
+        for item in self.canvas.items:
+            if item is not self.bubble:
+                self.canvas.move_item(item, item.rect.translated(0, dy))
+
+    def stats(self):
+        return {"rendered": self.created, "reused": self.reused, "coalesced": self.coalesced,
+                "active_tips": sum(1 for tip in self.active_tips.values() if tip in self.canvas.items)}
@@ -0,0 +1,210 @@
+'''
+Headless pet state engine.
+
+The mood/energy rules of the desktop pet without any Qt: state switching costs,
+sleep recovery, the forced idle/sleep rules, double-click petting and the daily
+reset quota. The clock and the random number generator are injectable, so the
+rules can be run and studied without a window (see pet_simulation.py).
+
+DesktopPet keeps the presentation (animations, tips, warnings, terminal output)
+and asks the engine what happened through the returned Outcome.
+'''
+
+import random                                   # Import a random module to generate random numbers
+import time                                     # Import time module as the default clock
+from datetime import date                       # Import the date class for the daily reset
+
+
+# The states a pet can be in
+STATES = ["study", "guitar", "game", "sleep", "idle"]
+
+# Mood and energy range from 0 to 5
+MIN_LEVEL = 0
+MAX_LEVEL = 5
+
+# Sleeping at least this long (seconds) restores full energy and 2 mood, shorter sleep restores 2 energy
+LONG_SLEEP = 3600
+LONG_SLEEP_MOOD = 2
+SHORT_SLEEP_ENERGY = 2
+
+# Mood/energy changes when entering a state, and the minimum levels needed to enter it
+STUDY_MIN_MOOD = 2
+STUDY_MIN_ENERGY = 2
+STUDY_MOOD_COST = 2
+STUDY_ENERGY_COST = 1
+GUITAR_MOOD_GAIN = 1
+GUITAR_ENERGY_COST = 1
+GAME_MOOD_GAIN = 2
+IDLE_ENERGY_GAIN = 1
+
+# Double-click petting: a random number of double-clicks in [3, 8] raises mood by 1
+PET_THRESHOLD_MIN = 3
+PET_THRESHOLD_MAX = 8
+PET_COOLDOWN = 60            # Seconds after a successful petting before petting counts again
+PET_COUNT_RESET = 10 * 60    # Seconds without double-clicks after which the count starts over
+
+# Resets allowed per day
+RESETS_PER_DAY = 1
+
+# Messages shown when asking for the state the pet is already in
+STATE_MESSAGES = {
+    "study": "You are studying now!",
+    "guitar": "Immersing in music...",
+    "game": "Don't play too much game!",
+    "sleep": "Already Zzz",
+    "idle": "Do something..."
+}
+
+
+# What a call into the engine did, so the window can show the matching feedback
+class Outcome:
+    SAME = "same"              # set_status: already in that state (message is the state tip)
+    REJECTED = "rejected"      # set_status: not enough mood/energy (message is the warning)
+    SWITCHED = "switched"      # set_status: state changed (status may differ from the request because of the forced rules)
+    COOLDOWN = "cooldown"      # double_click: still in the cooldown after the last successful petting
+    COUNTED = "counted"        # double_click: counted, threshold not reached yet
+    PETTED = "petted"          # double_click: threshold reached, mood increased
+    RESET = "reset"            # reset: mood and energy restored
+    NO_CHANCE = "no_chance"    # reset: today's reset was already used
+
+    def __init__(self, kind, message="", status=None):
+        self.kind = kind
+        self.message = message
+        self.status = status
+
+    def __repr__(self):
+        return f"Outcome({self.kind!r}, {self.message!r}, {self.status!r})"
+
+
+class PetEngine:
+    def __init__(self, status="idle", clock=time.time, rng=None):
+        self.clock = clock                          # Function returning the current time in seconds
+        self.rng = rng if rng is not None else random.Random()
+        self.status = status
+        self.mood = MAX_LEVEL
+        self.energy = MAX_LEVEL
+        self.last_sleep_time = None                 # Time the pet fell asleep, used for the sleep recovery
+        self.reset_chance = RESETS_PER_DAY
+        self.last_reset_date = self.today()
+        self.pet_touch_count = 0
+        self.double_click_threshold = self.new_threshold()
+        self.last_double_click_time = 0
+        self.last_successful_double_click = 0
+
+    def today(self):
+        return date.fromtimestamp(self.clock())
+
+    def new_threshold(self):
+        return self.rng.randint(PET_THRESHOLD_MIN, PET_THRESHOLD_MAX)
+
+    # Select the suffix based on the current mood value (bad, normal, happy)
+    def mood_suffix(self):
+        if self.mood <= 1:
+            return "bad"
+        elif self.mood >= MAX_LEVEL:
+            return "happy"
+        else:
+            return "normal"
+
+    # Switch to a new state, applying the mood/energy rules
+    def set_status(self, new_status):
+        if new_status == self.status:
+            return Outcome(Outcome.SAME, STATE_MESSAGES.get(new_status, ""), self.status)
+
+        now = self.clock()
+        # Leaving sleep restores mood and energy based on the length of sleep
+        if self.status == "sleep" and new_status != "sleep" and self.last_sleep_time:
+            if now - self.last_sleep_time >= LONG_SLEEP:
+                self.energy = MAX_LEVEL
+                self.mood = min(MAX_LEVEL, self.mood + LONG_SLEEP_MOOD)
+            else:
+                self.energy = min(MAX_LEVEL, self.energy + SHORT_SLEEP_ENERGY)
+            self.last_sleep_time = None
+
+        if new_status == "study":
+            if self.mood < STUDY_MIN_MOOD:
+                return Outcome(Outcome.REJECTED, "Don't have enough mood", self.status)
+            if self.energy < STUDY_MIN_ENERGY:
+                return Outcome(Outcome.REJECTED, "Don't have enough energy", self.status)
+            self.mood = max(MIN_LEVEL, self.mood - STUDY_MOOD_COST)
+            self.energy = max(MIN_LEVEL, self.energy - STUDY_ENERGY_COST)
+        elif new_status == "guitar":
+            if self.energy == MIN_LEVEL:
+                return Outcome(Outcome.REJECTED, "Energy too low!", self.status)
+            self.mood = min(MAX_LEVEL, self.mood + GUITAR_MOOD_GAIN)
+            self.energy = max(MIN_LEVEL, self.energy - GUITAR_ENERGY_COST)
+        elif new_status == "game":
+            if self.energy == MIN_LEVEL:
+                return Outcome(Outcome.REJECTED, "Energy too low!", self.status)
+            self.mood = min(MAX_LEVEL, self.mood + GAME_MOOD_GAIN)
+        elif new_status == "sleep":
+            if not self.last_sleep_time:
+                self.last_sleep_time = now
+        elif new_status == "idle":
+            self.energy = min(MAX_LEVEL, self.energy + IDLE_ENERGY_GAIN)
+
+        # Forced rules: no mood left means idle, no energy left means sleep
+        if self.mood == MIN_LEVEL:
+            self.status = "idle"
+        elif self.energy == MIN_LEVEL:
+            self.status = "sleep"
+            if not self.last_sleep_time:
+                self.last_sleep_time = now
+        else:
+            self.status = new_status
+        return Outcome(Outcome.SWITCHED, status=self.status)
+
+    # One double-click (petting): counts towards the random threshold, with a cooldown after each success
+    def double_click(self):
+        now = self.clock()
+        if now - self.last_successful_double_click < PET_COOLDOWN:
+            return Outcome(Outcome.COOLDOWN, status=self.status)
+        if now - self.last_double_click_time > PET_COUNT_RESET:
+            self.pet_touch_count = 0
+            self.double_click_threshold = self.new_threshold()
+        self.pet_touch_count += 1
+        self.last_double_click_time = now
+        if self.pet_touch_count < self.double_click_threshold:
+            return Outcome(Outcome.COUNTED, status=self.status)
+        self.mood = min(MAX_LEVEL, self.mood + 1)
+        self.last_successful_double_click = now
+        self.pet_touch_count = 0
+        self.double_click_threshold = self.new_threshold()
+        return Outcome(Outcome.PETTED, status=self.status)
+
+    # The part of the state kept across restarts (see state_journal.py), with the date as an ISO string for JSON
+    def state(self):
+        return {
+            "mood": self.mood,
+            "energy": self.energy,
+            "last_sleep_time": self.last_sleep_time,
+            "reset_chance": self.reset_chance,
+            "last_reset_date": self.last_reset_date.isoformat(),
+        }
+
+    # Restore a saved state; the sleep start only counts if the pet starts asleep again
+    def restore(self, state):
+        self.mood = min(MAX_LEVEL, max(MIN_LEVEL, int(state.get("mood", self.mood))))
+        self.energy = min(MAX_LEVEL, max(MIN_LEVEL, int(state.get("energy", self.energy))))
+        self.last_sleep_time = state.get("last_sleep_time") if self.status == "sleep" else None
+        self.reset_chance = int(state.get("reset_chance", self.reset_chance))
+        if state.get("last_reset_date"):
+            self.last_reset_date = date.fromisoformat(state["last_reset_date"])
+
+    # Number of resets left today (the quota is refilled on a new day)
+    def resets_left(self):
+        today = self.today()
+        if today != self.last_reset_date:
+            self.reset_chance = RESETS_PER_DAY
+            self.last_reset_date = today
+        return self.reset_chance
+
+    # Restore full mood and energy and enter the given state, if today's reset is still available
+    def reset(self, status):
+        if self.resets_left() <= 0:
+            return Outcome(Outcome.NO_CHANCE, status=self.status)
+        self.mood = MAX_LEVEL
+        self.energy = MAX_LEVEL
+        self.status = status
+        self.reset_chance -= 1
+        return Outcome(Outcome.RESET, status=self.status)
@@ -0,0 +1,62 @@
+'''
+Multi-pet mode: several pets in one QApplication.
+
+All pets share the decoded frames of the process-wide frame cache and are
+animated by one FrameClock instead of a timer per pet. One CursorMonitor
+samples the cursor for the idle detection of all pets. Each pet keeps its own
+state (mood, energy, petting counters). Pets are spread over all screens, in
+rows along the bottom of each screen's available area.
+
+python desktop_puppy.py --pets 5
+'''
+
+from PyQt5.QtWidgets import QApplication         # Import the application class for the screen list
+from animation_scheduler import CursorMonitor    # Import the cursor poll shared by the pets' idle detection
+from frame_cache import shared_frame_clock       # Import the shared frame clock
+from state_journal import StateJournal           # Import the journal that keeps each pet's mood and energy
+
+
+class PetManager:
+    # pet_class: the window class to create (DesktopPet); statuses: initial states, cycled over the pets (default: schedule)
+    # persist: keep each pet's mood and energy across restarts (the first pet shares its journal with single-pet mode)
+    def __init__(self, pet_class, count, window_size=150, idle_timeout=300, schedule=None, statuses=None,
+                 shared_clock=True, snap_distance=0, persist=False):
+        self.clock = shared_frame_clock() if shared_clock else None
+        self.cursor_monitor = CursorMonitor(QApplication.instance())  # Deleted with the application, after the pets
+        self.pets = []
+        screens = QApplication.screens()
+        slots = [0] * len(screens)      # Pets placed on each screen so far
+        for index in range(count):
+            screen = index % len(screens)
+            position = self.slot_position(screens[screen].availableGeometry(), slots[screen], window_size)
+            slots[screen] += 1
+            status = statuses[index % len(statuses)] if statuses else None
+            journal = StateJournal(f"pet{index + 1}" if index else "pet") if persist else None
+            pet = pet_class(window_size=window_size, idle_timeout=idle_timeout, schedule=schedule,
+                            position=position, status=status, frame_clock=self.clock,
+                            snap_distance=snap_distance, journal=journal, cursor_monitor=self.cursor_monitor)
+            self.pets.append(pet)
+
+    # Position of the slot-th pet on a screen: right to left along the bottom, 20 pixels from the right edge, then upwards
+    @staticmethod
+    def slot_position(area, slot, size):
+        per_row = max(1, (area.width() - 20) // size)
+        row, column = divmod(slot, per_row)
+        x = area.x() + area.width() - 20 - (column + 1) * size
+        y = area.y() + area.height() - (row + 1) * size
+        return (max(area.x(), x), max(area.y(), y))
+
+    # Pets that have not been closed
+    def open_pets(self):
+        return [pet for pet in self.pets if pet.isVisible()]
+
+    # Totals over the pets for the Diagnostics report (the frame cache and the prefetcher report their own counters)
+    def stats(self):
+        return {
+            "pets": len(self.open_pets()),
+            "frame_clock": self.clock.stats() if self.clock is not None else None,
+            "cursor_polls": self.cursor_monitor.polls,
+            "frames_rendered": sum(pet.player.frames_rendered for pet in self.pets),
+            "frames_skipped": sum(pet.player.frames_skipped for pet in self.pets),
+            "paints": sum(pet.canvas.paint_count for pet in self.pets),
+        }
@@ -0,0 +1,254 @@
+'''
+NumPy batch simulator for the pet rules.
+
+Advances thousands of pets at once over simulated days, applying the same
+rules as pet_engine.PetEngine to whole arrays of pets per step. Each step every
+pet may switch to a random state or get a burst of double-clicks, so the rules
+can be tuned and checked without a display:
+
+python pet_simulation.py --pets 10000 --days 14
+
+Prints a JSON summary (time spent per state, mood/energy, switches, rejected
+switches and successful pettings per pet and day).
+
+python pet_simulation.py --check
+
+runs the batch rules and one PetEngine per pet side by side on the same random
+inputs, and exits with status 1 at the first step where status, mood, energy
+or the petting count of a pet differ, so the two implementations cannot drift
+apart unnoticed.
+'''
+
+import argparse                                 # Import the command line argument parser
+import sys                                      # Import system modules for the exit status
+import json                                     # Import json to print the summary
+import time                                     # Import time module for the default start time and run timing
+import numpy as np                              # Import NumPy for the vectorised rules
+import pet_engine as rules                      # The rule constants shared with the single-pet engine
+
+
+STATES = rules.STATES
+STUDY, GUITAR, GAME, SLEEP, IDLE = (STATES.index(state) for state in ("study", "guitar", "game", "sleep", "idle"))
+
+
+class BatchSimulation:
+    def __init__(self, n_pets, seed=None, start_status="idle", start_time=None):
+        self.n = n_pets
+        self.rng = np.random.default_rng(seed)
+        self.now = time.time() if start_time is None else float(start_time)
+        self.status = np.full(n_pets, STATES.index(start_status), dtype=np.int8)
+        self.mood = np.full(n_pets, rules.MAX_LEVEL, dtype=np.int8)
+        self.energy = np.full(n_pets, rules.MAX_LEVEL, dtype=np.int8)
+        self.last_sleep = np.full(n_pets, np.nan)            # NaN means "not sleeping" (None in the engine)
+        self.touch_count = np.zeros(n_pets, dtype=np.int16)
+        self.threshold = self.new_thresholds(n_pets)
+        self.last_click = np.zeros(n_pets)
+        self.last_success = np.zeros(n_pets)
+        # Counters over the whole run
+        self.elapsed = 0.0
+        self.time_in_state = np.zeros(len(STATES))            # Pet-seconds spent in each state (closed intervals)
+        self.status_since = np.full(n_pets, self.now)         # Start of each pet's current state interval
+        self.switches = 0
+        self.same_requests = 0
+        self.rejections = 0
+        self.pettings = 0
+        self.cooldown_clicks = 0
+
+    def new_thresholds(self, count):
+        return self.rng.integers(rules.PET_THRESHOLD_MIN, rules.PET_THRESHOLD_MAX + 1, size=count).astype(np.int16)
+
+    # Vectorised PetEngine.set_status for the pets in idx (an index array), each asking for target[i] (state codes)
+    # Only the acting pets are touched, so a step costs time proportional to the number of events, not of pets
+    def set_status(self, idx, target):
+        now = self.now
+        status = self.status[idx]
+        mood = self.mood[idx]
+        energy = self.energy[idx]
+        last_sleep = self.last_sleep[idx]
+        same = target == status
+        act = ~same
+
+        # Leaving sleep restores mood and energy based on the length of sleep
+        waking = act & (status == SLEEP) & (target != SLEEP) & ~np.isnan(last_sleep)
+        long_sleep = waking & (now - np.nan_to_num(last_sleep) >= rules.LONG_SLEEP)
+        short_sleep = waking & ~long_sleep
+        energy = np.where(long_sleep, rules.MAX_LEVEL, energy)
+        mood = np.where(long_sleep, np.minimum(rules.MAX_LEVEL, mood + rules.LONG_SLEEP_MOOD), mood)
+        energy = np.where(short_sleep, np.minimum(rules.MAX_LEVEL, energy + rules.SHORT_SLEEP_ENERGY), energy)
+        last_sleep[waking] = np.nan
+
+        # Minimum levels needed to enter a state
+        rejected = act & (
+            ((target == STUDY) & ((mood < rules.STUDY_MIN_MOOD) | (energy < rules.STUDY_MIN_ENERGY)))
+            | (((target == GUITAR) | (target == GAME)) & (energy == rules.MIN_LEVEL)))
+        accepted = act & ~rejected
+
+        # Mood/energy changes of the target state
+        study = accepted & (target == STUDY)
+        guitar = accepted & (target == GUITAR)
+        game = accepted & (target == GAME)
+        idle = accepted & (target == IDLE)
+        mood = np.where(study, np.maximum(rules.MIN_LEVEL, mood - rules.STUDY_MOOD_COST), mood)
+        energy = np.where(study, np.maximum(rules.MIN_LEVEL, energy - rules.STUDY_ENERGY_COST), energy)
+        mood = np.where(guitar, np.minimum(rules.MAX_LEVEL, mood + rules.GUITAR_MOOD_GAIN), mood)
+        energy = np.where(guitar, np.maximum(rules.MIN_LEVEL, energy - rules.GUITAR_ENERGY_COST), energy)
+        mood = np.where(game, np.minimum(rules.MAX_LEVEL, mood + rules.GAME_MOOD_GAIN), mood)
+        energy = np.where(idle, np.minimum(rules.MAX_LEVEL, energy + rules.IDLE_ENERGY_GAIN), energy)
+        last_sleep[accepted & (target == SLEEP) & np.isnan(last_sleep)] = now
+
+        # Forced rules: no mood left means idle, no energy left means sleep
+        forced_idle = accepted & (mood == rules.MIN_LEVEL)
+        forced_sleep = accepted & ~forced_idle & (energy == rules.MIN_LEVEL)
+        new_status = np.where(accepted, target, status)
+        new_status[forced_idle] = IDLE
+        new_status[forced_sleep] = SLEEP
+        last_sleep[forced_sleep & np.isnan(last_sleep)] = now
+
+        self.record_time(idx, status)
+        self.status[idx] = new_status
+        self.mood[idx] = mood
+        self.energy[idx] = energy
+        self.last_sleep[idx] = last_sleep
+        self.same_requests += int(same.sum())
+        self.rejections += int(rejected.sum())
+        self.switches += int(accepted.sum())
+
+    # Vectorised PetEngine.double_click for the pets in idx (an index array), each double-clicking `clicks` times in a row
+    # A burst is resolved in closed form: once the threshold is reached the remaining clicks of the burst hit the cooldown
+    def double_click(self, idx, clicks=1):
+        now = self.now
+        clicks = np.broadcast_to(np.asarray(clicks, dtype=np.int16), idx.shape)
+        cooldown = now - self.last_success[idx] < rules.PET_COOLDOWN
+        idx_act = idx[~cooldown]
+        clicks_act = clicks[~cooldown]
+        stale = idx_act[now - self.last_click[idx_act] > rules.PET_COUNT_RESET]
+        self.touch_count[stale] = 0
+        self.threshold[stale] = self.new_thresholds(len(stale))
+        needed = self.threshold[idx_act] - self.touch_count[idx_act]
+        success = clicks_act >= needed
+        petted = idx_act[success]
+        counted = idx_act[~success]
+        self.touch_count[counted] += clicks_act[~success]
+        self.last_click[idx_act] = now
+        self.mood[petted] = np.minimum(rules.MAX_LEVEL, self.mood[petted] + 1)
+        self.last_success[petted] = now
+        self.touch_count[petted] = 0
+        self.threshold[petted] = self.new_thresholds(len(petted))
+        self.cooldown_clicks += int(clicks[cooldown].sum()) + int((clicks_act[success] - needed[success]).sum())
+        self.pettings += len(petted)
+
+    # Add the time since the last change to the state each pet in idx was in (old_status), and restart its interval
+    def record_time(self, idx, old_status):
+        self.time_in_state += np.bincount(old_status, weights=self.now - self.status_since[idx], minlength=len(STATES))
+        self.status_since[idx] = self.now
+
+    # Advance all pets by `days`, one step of `step` seconds at a time
+    # switch_rate / click_rate: chance per step that a pet gets a state switch / a burst of up to max_burst double-clicks
+    def run(self, days, step=60, switch_rate=1 / 120, click_rate=1 / 240, max_burst=8, state_weights=None):
+        weights = np.ones(len(STATES)) if state_weights is None else np.asarray(state_weights, dtype=float)
+        weights = weights / weights.sum()
+        event_rate = switch_rate + click_rate
+        for _ in range(int(days * 24 * 3600 / step)):
+            # Only the pets that act this step are drawn (duplicates merged), so a step costs O(events) instead of O(pets)
+            acting = np.unique(self.rng.integers(0, self.n, size=self.rng.binomial(self.n, event_rate)))
+            if len(acting):
+                is_switch = self.rng.random(len(acting)) * event_rate < switch_rate
+                switching = acting[is_switch]
+                if len(switching):
+                    self.set_status(switching, self.rng.choice(len(STATES), size=len(switching), p=weights).astype(np.int8))
+                clicking = acting[~is_switch]
+                if len(clicking):
+                    self.double_click(clicking, self.rng.integers(1, max_burst + 1, size=len(clicking)))
+            self.now += step
+            self.elapsed += step
+
+    def summary(self):
+        pet_days = self.n * self.elapsed / (24 * 3600) or 1
+        # Include the intervals that are still open
+        time_in_state = self.time_in_state + np.bincount(self.status, weights=self.now - self.status_since,
+                                                         minlength=len(STATES))
+        total_time = time_in_state.sum() or 1
+        return {
+            "pets": self.n,
+            "days": self.elapsed / (24 * 3600),
+            "time_in_state": {state: float(time_in_state[i] / total_time) for i, state in enumerate(STATES)},
+            "mean_mood": float(self.mood.mean()),
+            "mean_energy": float(self.energy.mean()),
+            "mood_histogram": np.bincount(self.mood, minlength=rules.MAX_LEVEL + 1).tolist(),
+            "energy_histogram": np.bincount(self.energy, minlength=rules.MAX_LEVEL + 1).tolist(),
+            "switches_per_pet_day": self.switches / pet_days,
+            "rejections_per_pet_day": self.rejections / pet_days,
+            "same_requests_per_pet_day": self.same_requests / pet_days,
+            "pettings_per_pet_day": self.pettings / pet_days,
+            "cooldown_clicks_per_pet_day": self.cooldown_clicks / pet_days,
+        }
+
+
+# Run the batch rules and one PetEngine per pet on the same random switches and double-click bursts, comparing every
+# pet after every step; return the first difference, or None. Thresholds are fixed, as the two draw them differently
+def compare_with_engine(n_pets=200, steps=3000, step=30, seed=0, threshold=rules.PET_THRESHOLD_MIN,
+                        switch_rate=0.01, click_rate=0.05, max_burst=8):
+    inputs = np.random.default_rng(seed)
+    simulation = BatchSimulation(n_pets, seed=seed)
+    simulation.new_thresholds = lambda count: np.full(count, threshold, dtype=np.int16)
+    simulation.threshold[:] = threshold
+    engines = []
+    for _ in range(n_pets):
+        engine = rules.PetEngine(clock=lambda: simulation.now)
+        engine.new_threshold = lambda: threshold
+        engine.double_click_threshold = threshold
+        engines.append(engine)
+    for number in range(steps):
+        action = inputs.random(n_pets)
+        switching = np.flatnonzero(action < switch_rate)
+        clicking = np.flatnonzero((action >= switch_rate) & (action < switch_rate + click_rate))
+        targets = inputs.integers(0, len(STATES), size=len(switching)).astype(np.int8)
+        bursts = inputs.integers(1, max_burst + 1, size=len(clicking))
+        if len(switching):
+            simulation.set_status(switching, targets)
+        if len(clicking):
+            simulation.double_click(clicking, bursts)
+        for pet, target in zip(switching, targets):
+            engines[pet].set_status(STATES[target])
+        for pet, clicks in zip(clicking, bursts):
+            for _ in range(clicks):
+                engines[pet].double_click()
+        for pet, engine in enumerate(engines):
+            batch = (STATES[simulation.status[pet]], int(simulation.mood[pet]), int(simulation.energy[pet]),
+                     int(simulation.touch_count[pet]))
+            single = (engine.status, engine.mood, engine.energy, engine.pet_touch_count)
+            if batch != single:
+                return {"step": number, "pet": pet, "threshold": threshold,
+                        "batch": batch, "engine": single, "fields": ["status", "mood", "energy", "touch_count"]}
+        simulation.now += step
+        simulation.elapsed += step
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-simulate many pets with the desktop puppy rules")
+    parser.add_argument("--pets", type=int, default=10000, help="number of pets (default: 10000)")
+    parser.add_argument("--days", type=float, default=7, help="simulated days (default: 7)")
+    parser.add_argument("--step", type=float, default=60, help="seconds per simulation step (default: 60)")
+    parser.add_argument("--switch-rate", type=float, default=1 / 120, help="chance of a state switch per pet and step")
+    parser.add_argument("--click-rate", type=float, default=1 / 240, help="chance of a double-click burst per pet and step")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--check", action="store_true",
+                        help="compare the batch rules with PetEngine step by step (every petting threshold) and exit")
+    args = parser.parse_args()
+    if args.check:
+        started = time.perf_counter()
+        result = {"thresholds": list(range(rules.PET_THRESHOLD_MIN, rules.PET_THRESHOLD_MAX + 1)), "mismatch": None}
+        for threshold in result["thresholds"]:
+            result["mismatch"] = compare_with_engine(seed=args.seed or 0, threshold=threshold)
+            if result["mismatch"] is not None:
+                break
+        result["runtime_seconds"] = time.perf_counter() - started
+        print(json.dumps(result, indent=2))
+        sys.exit(1 if result["mismatch"] is not None else 0)
+    started = time.perf_counter()
+    simulation = BatchSimulation(args.pets, seed=args.seed)
+    simulation.run(args.days, step=args.step, switch_rate=args.switch_rate, click_rate=args.click_rate)
+    result = simulation.summary()
+    result["runtime_seconds"] = time.perf_counter() - started
+    print(json.dumps(result, indent=2))
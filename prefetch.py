@@ -0,0 +1,196 @@
+'''
+Predictive background decoding of the animations a pet is likely to show next.
+
+After every animation change the prefetcher guesses the next assets from the
+pet's rules: the mood variant petting would lead to, the state the schedule
+switches to at its next boundary, and the outcome of every state in the menu
+(worked out on a copy of the pet's PetEngine, so mood and energy thresholds
+are taken into account). The guesses are decoded and scaled on a worker
+thread and handed to the GUI thread, which only inserts them into the frame
+cache. A correct guess turns the next transition into a frame swap.
+
+The counters tell how often a transition found its frames prefetched, how
+much decode time that saved, and how much decoding still happened on the GUI
+thread. Prefetching is disabled with PUPPY_PREFETCH=0.
+'''
+
+import atexit                                   # Join the worker pool before the interpreter is torn down
+import copy                                     # Copy the pet engine to try out transitions
+import os                                       # Import the operating system module for environment variables
+import time                                     # Import time module for measuring decode time
+from datetime import datetime                   # Import date and time processing module
+from PyQt5 import sip                           # Tell whether the prefetcher's C++ object still exists
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QCoreApplication, pyqtSignal  # Worker pool and signals
+from pet_engine import STATES, MAX_LEVEL, Outcome  # The pet rules used for the predictions
+from diagnostics import DIAGNOSTICS              # Decode-time histogram (when enabled)
+
+
+# Assets decoded ahead of every transition at most (0 disables prefetching)
+PREFETCH_LIMIT = int(os.environ.get("PUPPY_PREFETCH", "4"))
+
+# Worker threads decoding in the background; one keeps the decoding from competing with the GUI thread
+PREFETCH_THREADS = 1
+
+
+# The assets the pet is likely to show next, most likely first (the current asset excluded)
+def predict_assets(pet, now=None):
+    engine = pet.engine
+    now = now or datetime.now()
+    candidates = []
+
+    # Asset shown after switching to a state, or None if the switch would be rejected
+    def outcome_path(status, clock):
+        trial = copy.copy(engine)
+        trial.clock = clock
+        if trial.set_status(status).kind != Outcome.SWITCHED:
+            return None
+        return pet.asset_path(trial.status, trial.mood_suffix())
+
+    # Petting raises the mood by one, which can move the pet into the happy variant
+    if engine.mood < MAX_LEVEL:
+        trial = copy.copy(engine)
+        trial.mood += 1
+        candidates.append(pet.asset_path(engine.status, trial.mood_suffix()))
+    # The state the schedule switches to at its next boundary
+    boundary = pet.schedule.next_boundary(now)
+    if boundary is not None:
+        candidates.append(outcome_path(pet.schedule.status_at(boundary), boundary.timestamp))
+    # States chosen from the menu
+    for status in STATES:
+        candidates.append(outcome_path(status, engine.clock))
+
+    current = pet.get_gif_path()
+    assets = []
+    for path in candidates:
+        if path is not None and path != current and path not in assets:
+            assets.append(path)
+    return assets
+
+
+# Carries a task's result to the GUI thread; owned by the task, so it outlives the decode
+class DecodeSignals(QObject):
+    # Emitted from a worker thread, delivered to the GUI thread (queued connection)
+    decoded = pyqtSignal(object, object, float)
+
+
+# Decodes one asset on a worker thread and reports the frames back to the prefetcher
+class DecodeTask(QRunnable):
+    def __init__(self, prefetcher, key):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.cache = prefetcher.cache
+        self.key = key
+        self.signals = DecodeSignals()  # Created on the GUI thread, so the connection is queued
+        self.signals.decoded.connect(prefetcher.on_decoded)
+
+    def run(self):
+        started = time.perf_counter()
+        animation = self.cache.decode(*self.key)  # Decoding and scaling QImages is safe off the GUI thread
+        if sip.isdeleted(self.prefetcher):
+            return  # Torn down while decoding: nobody is left to take the frames
+        self.signals.decoded.emit(self.key, animation, time.perf_counter() - started)
+
+
+class Prefetcher(QObject):
+    def __init__(self, cache, limit=PREFETCH_LIMIT, threads=PREFETCH_THREADS, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.limit = limit
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(threads)
+        self.pending = {}             # key -> DecodeTask being decoded
+        self.prefetched = {}          # key -> decode seconds, for prefetched entries not shown yet
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+        atexit.register(self.shutdown)  # Also without an event loop (scripts, replay, benchmarks)
+        # Counters
+        self.predictions = 0          # Assets queued for background decoding
+        self.completed = 0
+        self.hits = 0                 # Transitions whose frames had been prefetched
+        self.misses = 0               # Transitions decoded on the GUI thread
+        self.late = 0                 # Misses whose asset was still being prefetched
+        self.cached = 0               # Transitions to frames that were still cached from earlier
+        self.saved_seconds = 0.0      # Decode time moved off the GUI thread by hits
+        self.sync_seconds = 0.0       # Decode time spent on the GUI thread by misses
+
+    # Return the frames for a transition (like FrameCache.get), counting whether the prediction was right
+    def fetch(self, path, size=None, device_pixel_ratio=1.0):
+        key = self.cache.key(path, size, device_pixel_ratio)
+        seconds = self.prefetched.pop(key, None)
+        if key in self.cache:
+            if seconds is not None:
+                self.hits += 1
+                self.saved_seconds += seconds
+            else:
+                self.cached += 1
+            return self.cache.get(path, size, device_pixel_ratio)
+        self.misses += 1
+        if key in self.pending:
+            self.late += 1
+        started = time.perf_counter()
+        animation = self.cache.get(path, size, device_pixel_ratio)
+        self.sync_seconds += time.perf_counter() - started
+        return animation
+
+    # Queue the likely next assets of a pet for background decoding
+    def prefetch_for(self, pet):
+        if self.limit <= 0:
+            return
+        size, dpr = pet.frame_size()
+        for path in predict_assets(pet)[:self.limit]:
+            key = self.cache.key(path, size, dpr)
+            if key in self.cache or key in self.pending:
+                continue
+            task = DecodeTask(self, key)
+            task.setAutoDelete(False)  # Kept in pending until its result has arrived
+            self.pending[key] = task
+            self.predictions += 1
+            self.pool.start(task)
+
+    # Runs on the GUI thread: the frames only have to be inserted into the cache
+    # The decode time is recorded here rather than on the worker, so the histograms are only touched by one thread
+    def on_decoded(self, key, animation, seconds):
+        self.pending.pop(key, None)
+        self.completed += 1
+        if DIAGNOSTICS.enabled:
+            DIAGNOSTICS.record("decode_ms", seconds * 1000)
+        if animation is None or key in self.cache:
+            return  # Not decodable, or decoded on the GUI thread meanwhile
+        self.cache.put(key, animation)
+        self.prefetched[key] = seconds
+
+    # Let running decodes finish before the application is torn down
+    def shutdown(self):
+        if sip.isdeleted(self) or sip.isdeleted(self.pool):
+            return  # Already gone, and the pool joined its threads on deletion
+        self.pool.clear()
+        self.pool.waitForDone()
+
+    def stats(self):
+        transitions = self.hits + self.misses
+        return {
+            "predictions": self.predictions,
+            "completed": self.completed,
+            "pending": len(self.pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "late": self.late,
+            "cached": self.cached,
+            "accuracy": self.hits / transitions if transitions else 0.0,
+            "unused": sum(1 for key in self.prefetched if key in self.cache),
+            "saved_ms": self.saved_seconds * 1000,
+            "sync_decode_ms": self.sync_seconds * 1000,
+        }
+
+
+# One prefetcher per frame cache, so pets sharing a cache also share the worker and the counters
+_prefetchers = {}
+
+
+def prefetcher_for(cache):
+    prefetcher = _prefetchers.get(id(cache))
+    if prefetcher is None:
+        prefetcher = _prefetchers[id(cache)] = Prefetcher(cache)
+        DIAGNOSTICS.add_source("prefetch", prefetcher.stats)  # Prediction and hit counters in the report and dump
+    return prefetcher
@@ -0,0 +1,214 @@
+'''
+Event-driven schedule engine for the automatic state switching.
+
+A schedule is a list of time ranges, optionally limited to some weekdays:
+
+[
+    {"start": "23:00", "end": "12:00", "status": "sleep"},
+    {"start": "12:00", "end": "19:00", "status": "study"},
+    {"start": "10:00", "end": "18:00", "status": "game", "days": ["sat", "sun"]}
+]
+
+Ranges may wrap around midnight. Rules with "days" take priority over rules
+without, and later rules take priority over earlier ones. Times not covered by
+any rule use the default status (idle).
+
+The rules are flattened once into a sorted index of the week, so looking up the
+status at a time is a binary search. ScheduleTimer arms one single-shot timer
+for the next boundary instead of polling the clock. Qt timers run on the
+monotonic clock, so the timer is armed at most MAX_ARM_INTERVAL ahead and then
+re-armed from the wall clock: a boundary brought forward by a clock change
+(NTP step, manual change, resume without a logind signal) is noticed within a
+minute. A timer firing early (clock set back) is re-armed, and suspend/resume
+re-syncs straight away when the session reports it.
+'''
+
+import json                                     # Import json to read user-defined schedules
+import time                                     # Import time module for wall-clock checks
+from bisect import bisect_right                 # Binary search in the sorted boundary list
+from datetime import datetime, timedelta        # Import date and time classes
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal, pyqtSlot  # Import core modules (timer, signals)
+from PyQt5.QtGui import QGuiApplication          # Application state changes (e.g. after unlocking the screen)
+
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+# The built-in schedule (the same hours the pet has always used)
+DEFAULT_RULES = [
+    {"start": "23:00", "end": "12:00", "status": "sleep"},
+    {"start": "12:00", "end": "19:00", "status": "study"},
+    {"start": "19:00", "end": "20:00", "status": "guitar"},
+    {"start": "20:00", "end": "23:00", "status": "game"},
+]
+
+# A timeout that arrives this many seconds away from the expected wall-clock time means the clock jumped
+CLOCK_JUMP_TOLERANCE = 2
+
+# The boundary timer is armed at most this many seconds ahead, then re-armed from the wall clock
+MAX_ARM_INTERVAL = 60
+
+
+# Convert "HH:MM" or "HH:MM:SS" into seconds after midnight
+def parse_time(text):
+    parts = [int(part) for part in text.split(":")]
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"Invalid time: {text!r}")
+    hours, minutes, seconds = (parts + [0])[:3]
+    if not (0 <= hours <= 24 and 0 <= minutes < 60 and 0 <= seconds < 60) or (hours == 24 and (minutes or seconds)):
+        raise ValueError(f"Invalid time: {text!r}")
+    return hours * 3600 + minutes * 60 + seconds
+
+
+# One time range of the schedule
+class ScheduleRule:
+    def __init__(self, start, end, status, days=None):
+        self.start = parse_time(start) if isinstance(start, str) else start  # Seconds after midnight
+        self.end = parse_time(end) if isinstance(end, str) else end
+        self.status = status
+        if days is None:
+            self.days = None
+        else:
+            self.days = [WEEKDAYS.index(day[:3].lower()) if isinstance(day, str) else day for day in days]
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["start"], data["end"], data["status"], data.get("days"))
+
+    # The [start, end) intervals of this rule in seconds of the week (Monday 00:00 = 0)
+    def week_intervals(self):
+        intervals = []
+        for day in (range(7) if self.days is None else self.days):
+            start = day * DAY + self.start
+            end = day * DAY + self.end
+            if self.end <= self.start:
+                end += DAY  # The range wraps around midnight into the next day
+            if end <= WEEK:
+                intervals.append((start, end))
+            else:
+                intervals.append((start, WEEK))  # Sunday ranges wrap into Monday morning
+                intervals.append((0, end - WEEK))
+        return intervals
+
+
+class Schedule:
+    def __init__(self, rules=None, default_status="idle"):
+        self.rules = [rule if isinstance(rule, ScheduleRule) else ScheduleRule.from_dict(rule)
+                      for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.default_status = default_status
+        self.build_index()
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return cls(data.get("rules", []), data.get("default", "idle"))
+        return cls(data)
+
+    # Flatten the rules into sorted segment starts and the status of each segment
+    def build_index(self):
+        # Weekday rules override everyday rules, later rules override earlier ones
+        ordered = [rule for rule in self.rules if rule.days is None] + [rule for rule in self.rules if rule.days is not None]
+        painted = [(interval, rule.status) for rule in ordered for interval in rule.week_intervals()]
+        points = sorted({0, WEEK} | {point for interval, _ in painted for point in interval})
+        self.starts = []
+        self.statuses = []
+        for start, end in zip(points, points[1:]):
+            status = self.default_status
+            for (low, high), rule_status in painted:
+                if low <= start and end <= high:
+                    status = rule_status
+            if self.statuses and self.statuses[-1] == status:
+                continue  # Merge with the previous segment
+            self.starts.append(start)
+            self.statuses.append(status)
+
+    @staticmethod
+    def week_offset(when):
+        return when.weekday() * DAY + when.hour * 3600 + when.minute * 60 + when.second
+
+    # Return the scheduled status at a (local, naive) datetime
+    def status_at(self, when):
+        return self.statuses[bisect_right(self.starts, self.week_offset(when)) - 1]
+
+    # Return the datetime of the next status change after `when`, or None if the status never changes
+    def next_boundary(self, when):
+        if len(self.starts) < 2:
+            return None
+        offset = self.week_offset(when)
+        index = bisect_right(self.starts, offset)
+        if index < len(self.starts):
+            boundary = self.starts[index]
+        elif self.statuses[0] == self.statuses[-1]:
+            boundary = WEEK + self.starts[1]  # The last segment continues into next Monday's first one
+        else:
+            boundary = WEEK
+        week_start = when.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=when.weekday())
+        return week_start + timedelta(seconds=boundary)
+
+
+# Emits statusChanged at every schedule boundary, with a single armed timer and no polling
+class ScheduleTimer(QObject):
+    statusChanged = pyqtSignal(str)
+
+    def __init__(self, schedule, parent=None, now=datetime.now):
+        super().__init__(parent)
+        self.schedule = schedule
+        self.now = now
+        self.status = schedule.status_at(now())
+        self.deadline = None            # Wall-clock timestamp the timer is armed for
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.VeryCoarseTimer)  # Second accuracy is plenty for a schedule
+        self.timer.timeout.connect(self.on_timeout)
+        # Monotonic timers stop during suspend, so re-sync when the session becomes active again
+        QGuiApplication.instance().applicationStateChanged.connect(self.resync)
+        self.connect_sleep_signal()
+        self.arm()
+
+    # On Linux, logind announces suspend/resume over D-Bus; this is optional and skipped when QtDBus is unavailable
+    def connect_sleep_signal(self):
+        try:
+            from PyQt5.QtDBus import QDBusConnection
+        except ImportError:
+            return
+        bus = QDBusConnection.systemBus()
+        if bus.isConnected():
+            bus.connect("org.freedesktop.login1", "/org/freedesktop/login1", "org.freedesktop.login1.Manager",
+                        "PrepareForSleep", self.on_prepare_for_sleep)
+
+    @pyqtSlot(bool)
+    def on_prepare_for_sleep(self, going_to_sleep):
+        if not going_to_sleep:
+            self.resync()
+
+    # Arm the single-shot timer for the next boundary
+    def arm(self):
+        self.timer.stop()
+        boundary = self.schedule.next_boundary(self.now())
+        if boundary is None:
+            self.deadline = None
+            return
+        self.deadline = boundary.timestamp()  # Local time → timestamp also handles daylight saving changes
+        delay = max(0.0, self.deadline - time.time())
+        self.timer.start(int(min(delay, MAX_ARM_INTERVAL) * 1000) + 1)  # +1 ms so we land past the boundary
+
+    def on_timeout(self):
+        if self.deadline is not None and time.time() < self.deadline - CLOCK_JUMP_TOLERANCE:
+            self.arm()  # Boundary not reached yet (further than MAX_ARM_INTERVAL, or the clock was set back)
+            return
+        self.resync()
+
+    # Recompute the status from the wall clock (after a boundary, a clock jump or a resume) and re-arm
+    def resync(self, *args):
+        status = self.schedule.status_at(self.now())
+        self.arm()
+        if status != self.status:
+            self.status = status
+            self.statusChanged.emit(status)
+
+    def set_schedule(self, schedule):
+        self.schedule = schedule
+        self.resync()
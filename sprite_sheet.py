@@ -0,0 +1,141 @@
+'''
+Memory-mapped sprite-sheet asset format.
+
+A sprite sheet holds every frame of one animation as raw premultiplied ARGB32,
+stacked into one vertical atlas, together with a frame-delay table. Loading
+one memory-maps the file and wraps each frame as a QImage that points straight
+into the mapping: no LZW decoding, no palette expansion and no copy. Pages
+come from the page cache, so several pet processes share the frame memory.
+
+Layout (little endian):
+
+header     magic "DPSS", version u16, pixel format u16, width u32, height u32, frame count u32,
+           source mtime_ns i64, source size i64, source path length u16, source path (utf-8)
+delays     frame count × u32 milliseconds
+padding    up to a 64-byte boundary
+frames     frame count × height × width × 4 bytes
+
+The source path is relative to the sheet's directory, so sheets written
+anywhere (convert_assets.py --output) find their GIF. Version 1 sheets only
+stored the file name, looked up in the parent of the sheet's directory. The
+source mtime and size tell whether the GIF the sheet was made from has changed
+since; stale sheets, and sheets whose source cannot be found, are ignored.
+Sheets are written by convert_assets.py into assets/sprites/, named
+<asset>@<pixels>.sprite for a given frame size, or <asset>.sprite at the
+original size.
+'''
+
+import mmap                                     # Memory-map sprite sheets
+import os                                       # Import the operating system module and process the file path
+import struct                                   # Pack and unpack the header and delay table
+from PyQt5 import sip                            # Wrap mapped memory as a pointer for QImage
+from PyQt5.QtGui import QImage                   # Import the image class
+
+
+MAGIC = b"DPSS"
+VERSION = 2
+VERSIONS = (1, 2)                               # Versions that can be read
+FORMAT_ARGB32_PREMULTIPLIED = 0
+HEADER = struct.Struct("<4sHHIIIqqH")
+ALIGNMENT = 64
+EXTENSION = ".sprite"
+SPRITE_DIR = os.path.join(os.path.dirname(__file__), "assets", "sprites")
+
+
+def is_sprite_sheet(path):
+    return path.endswith(EXTENSION)
+
+
+# File name of the sheet for an asset, at a pixel size (None for the original size)
+def sprite_path(asset_path, pixel_size=None, directory=SPRITE_DIR):
+    name = os.path.splitext(os.path.basename(asset_path))[0]
+    suffix = f"@{pixel_size}" if pixel_size else ""
+    return os.path.join(directory, f"{name}{suffix}{EXTENSION}")
+
+
+# Return the converted sheet to use for an asset (exact pixel size first, then original size), or None
+def find_sprite(asset_path, pixel_size=None, directory=SPRITE_DIR):
+    for candidate in (sprite_path(asset_path, pixel_size, directory), sprite_path(asset_path, None, directory)):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+# The asset a sheet was converted from, by name (<asset>[@pixels].sprite in assets/sprites/ → assets/<asset>.gif or .png)
+def guess_source(path):
+    name = os.path.splitext(os.path.basename(path))[0].split("@")[0]
+    assets = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+    for extension in (".gif", ".png"):
+        candidate = os.path.join(assets, name + extension)
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+# Write frames (QImages of one size) and their delays as a sprite sheet
+def write_sprite_sheet(path, frames, delays, source_path):
+    width, height = frames[0].width(), frames[0].height()
+    source = os.stat(source_path)
+    try:
+        name = os.path.relpath(os.path.abspath(source_path), os.path.dirname(os.path.abspath(path)))
+    except ValueError:
+        name = os.path.abspath(source_path)  # On another drive (Windows): no relative path exists
+    name = name.replace(os.sep, "/").encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, FORMAT_ARGB32_PREMULTIPLIED, width, height, len(frames),
+                         source.st_mtime_ns, source.st_size, len(name)) + name
+    header += struct.pack(f"<{len(frames)}I", *delays)
+    header += b"\0" * (-len(header) % ALIGNMENT)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        for frame in frames:
+            frame = frame.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+            if frame.size() != frames[0].size():
+                raise ValueError("All frames of a sprite sheet must have the same size")
+            ptr = frame.constBits()
+            ptr.setsize(frame.sizeInBytes())
+            f.write(bytes(ptr))
+    os.replace(tmp, path)  # Atomic, so a running pet never maps a half-written sheet
+
+
+# Memory-map a sprite sheet and return (frames, delays, source path), or None if it is invalid or stale
+# The frames point into the mapping; each frame keeps a reference to it so it stays mapped while in use
+def read_sprite_sheet(path):
+    try:
+        with open(path, "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if len(mapping) < HEADER.size:
+        return None
+    magic, version, pixel_format, width, height, count, mtime_ns, size, name_length = HEADER.unpack_from(mapping)
+    if magic != MAGIC or version not in VERSIONS or pixel_format != FORMAT_ARGB32_PREMULTIPLIED or count == 0:
+        return None
+    offset = HEADER.size
+    name = bytes(mapping[offset:offset + name_length]).decode("utf-8")
+    offset += name_length
+    directory = os.path.dirname(os.path.abspath(path))
+    if version == 1:
+        directory = os.path.dirname(directory)  # Only the file name, next to the sprites directory
+    source_path = os.path.normpath(os.path.join(directory, name))
+    try:
+        source = os.stat(source_path)
+    except OSError:
+        return None  # Without its source, a stale sheet could not be told from a current one
+    if (source.st_mtime_ns, source.st_size) != (mtime_ns, size):
+        return None  # The GIF changed after conversion
+    delays = list(struct.unpack_from(f"<{count}I", mapping, offset))
+    offset += 4 * count
+    offset += -offset % ALIGNMENT
+    frame_bytes = width * height * 4
+    if len(mapping) < offset + frame_bytes * count:
+        return None  # Truncated file
+    base = int(sip.voidptr(mapping))
+    frames = []
+    for index in range(count):
+        frame = QImage(sip.voidptr(base + offset + index * frame_bytes), width, height, width * 4,
+                       QImage.Format_ARGB32_Premultiplied)
+        frame.mapping = mapping  # Keep the file mapped as long as the frame is alive
+        frames.append(frame)
+    return frames, delays, source_path
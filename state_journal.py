@@ -0,0 +1,171 @@
+'''
+Write-behind persistence of the pet's mood, energy, sleep start and reset quota.
+
+Changes are kept as an append-only journal of JSON lines next to a snapshot:
+
+<name>.snapshot   {"seq": 41, "state": {...}}     the full state up to record 41
+<name>.journal    {"seq": 42, "mood": 4}          one line per change, changed fields only
+
+Recording a change on the GUI thread only compares it with the last state and
+queues a line. A single-shot timer hands the queued lines to a writer thread
+once per flush interval, which appends and fsyncs them, so the event loop never
+waits for the disk and a crash loses at most one flush interval. When the
+journal grows past a size limit, and on exit, the writer folds it into a new
+snapshot (written to a temporary file and renamed into place) and empties it.
+
+Loading reads the snapshot and replays the journal lines after it. A line cut
+off by a crash is ignored, and lines already contained in the snapshot (a crash
+between writing the snapshot and emptying the journal) are skipped by their
+sequence number.
+
+The files are kept in $PUPPY_STATE_DIR, or desktop_puppy/ in the XDG state
+directory (~/.local/state by default).
+'''
+
+import json                                     # Import json for the snapshot and the journal lines
+import os                                       # Import the operating system module and process the file path
+import queue                                    # Hand batches to the writer thread
+import threading                                # The writer thread
+from PyQt5.QtCore import Qt, QObject, QTimer, QCoreApplication  # Import core modules (timer, application)
+
+
+DEFAULT_STATE_DIR = os.environ.get("PUPPY_STATE_DIR") or os.path.join(
+    os.environ.get("XDG_STATE_HOME", os.path.join(os.path.expanduser("~"), ".local", "state")), "desktop_puppy")
+
+# Queued changes are written at most this long after they happen (ms)
+FLUSH_INTERVAL = 1000
+
+# The journal is folded into the snapshot once it is larger than this (bytes)
+COMPACT_BYTES = 64 * 1024
+
+
+class StateJournal(QObject):
+    def __init__(self, name="pet", directory=DEFAULT_STATE_DIR, flush_interval=FLUSH_INTERVAL,
+                 compact_bytes=COMPACT_BYTES, parent=None):
+        super().__init__(parent)
+        self.snapshot_path = os.path.join(directory, name + ".snapshot")
+        self.journal_path = os.path.join(directory, name + ".journal")
+        self.compact_bytes = compact_bytes
+        self.state = {}               # Latest state, as recorded on the GUI thread
+        self.seq = 0                  # Sequence number of the latest record
+        self.journal_bytes = 0        # Size of the journal including queued lines
+        self.queued = []              # Lines not handed to the writer yet
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(flush_interval)
+        self.timer.setTimerType(Qt.CoarseTimer)
+        self.timer.timeout.connect(self.flush)
+        self.batches = queue.Queue()
+        self.writer = None            # Started with the first flush
+        self.closed = False
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.close)
+        # Counters
+        self.records = 0
+        self.flushes = 0
+        self.compactions = 0
+        self.write_errors = 0
+
+    # Read the snapshot and replay the journal after it; return the state (empty if nothing was saved)
+    def load(self):
+        state, seq = {}, 0
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            state, seq = dict(snapshot.get("state", {})), int(snapshot.get("seq", 0))
+        except (OSError, ValueError):
+            pass  # No snapshot yet, or an unreadable one: start from the journal alone
+        try:
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            data = b""
+        self.journal_bytes = len(data)
+        if data and not data.endswith(b"\n"):
+            self.queued.append("\n")  # End the cut-off line, so the next record starts on a line of its own
+        for line in data.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut off by a crash
+            record_seq = record.pop("seq", 0)
+            if record_seq > seq:
+                state.update(record)
+                seq = record_seq
+        self.state, self.seq = dict(state), seq
+        return state
+
+    # Queue the fields of `state` that changed since the last record (cheap: no I/O on the calling thread)
+    def record(self, state):
+        if self.closed:
+            return
+        changes = {key: value for key, value in state.items() if key not in self.state or self.state[key] != value}
+        if not changes:
+            return
+        self.state.update(changes)
+        self.seq += 1
+        line = json.dumps(dict(seq=self.seq, **changes), separators=(",", ":")) + "\n"
+        self.queued.append(line)
+        self.journal_bytes += len(line)
+        self.records += 1
+        if not self.timer.isActive():
+            self.timer.start()
+
+    # Hand the queued lines to the writer thread, with a snapshot when the journal has grown too large
+    def flush(self, compact=False):
+        compact = compact or self.journal_bytes > self.compact_bytes
+        if not self.queued and not compact:
+            return
+        snapshot = {"seq": self.seq, "state": dict(self.state)} if compact else None
+        self.batches.put((self.queued, snapshot))
+        self.queued = []
+        self.flushes += 1
+        if compact:
+            self.journal_bytes = 0
+            self.compactions += 1
+        if self.writer is None:
+            self.writer = threading.Thread(target=self.write_loop, name="state-journal", daemon=True)
+            self.writer.start()
+
+    # Writer thread: append and fsync each batch, then write the snapshot and empty the journal if asked to
+    def write_loop(self):
+        while True:
+            batch = self.batches.get()
+            if batch is None:
+                return
+            lines, snapshot = batch
+            try:
+                os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+                if lines:
+                    with open(self.journal_path, "a", encoding="utf-8") as f:
+                        f.writelines(lines)
+                        f.flush()
+                        os.fsync(f.fileno())
+                if snapshot is not None:
+                    tmp = self.snapshot_path + ".tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump(snapshot, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp, self.snapshot_path)  # Atomic: the old snapshot stays valid until here
+                    with open(self.journal_path, "w"):
+                        pass  # Everything in the journal is now in the snapshot
+            except OSError:
+                self.write_errors += 1  # Persistence is best effort; the pet keeps running
+
+    # Write everything and compact (on exit); waits for the writer thread
+    def close(self):
+        if self.closed:
+            return
+        self.timer.stop()
+        if self.seq:
+            self.flush(compact=True)
+        self.closed = True
+        if self.writer is not None:
+            self.batches.put(None)
+            self.writer.join()
+
+    def stats(self):
+        return {"records": self.records, "flushes": self.flushes, "compactions": self.compactions,
+                "journal_bytes": self.journal_bytes, "queued": len(self.queued), "write_errors": self.write_errors}